@@ -0,0 +1,261 @@
+# asgi.py
+# ASGI entry point, e.g. `uvicorn asgi:app`. Translations run on a bounded process
+# pool so the event loop stays free for small requests and health checks; routes
+# not handled here are passed to the Flask app when asgiref is installed.
+import asyncio
+import contextlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import parse_qs
+
+from werkzeug.exceptions import RequestEntityTooLarge
+
+from compression import COMPRESS_MIN_BYTES, compress, compressible, decompress, encodings, negotiate
+from flaskapp import app as flask_app
+from flaskapp import (API_MAX_JOBS, document_cache, document_key, languages, translate_code,
+                      translator_fingerprint)
+
+try:
+    from asgiref.wsgi import WsgiToAsgi
+except ImportError:  # optional: only needed to serve the HTML routes over ASGI
+    WsgiToAsgi = None
+
+# ---------------- SETTINGS ----------------
+WORKERS = int(os.environ.get("ASGI_WORKERS", os.cpu_count() or 1))
+# Translation requests allowed to be running or queued before answering 503.
+MAX_PENDING = int(os.environ.get("ASGI_MAX_PENDING", WORKERS * 4))
+# Up to this many bytes of input per request are translated inline, on a thread
+# rather than the pool and without taking an admission place (a batch shares the
+# budget); the rest goes to the pool.
+INLINE_BYTES = int(os.environ.get("ASGI_INLINE_BYTES", 4096))
+MAX_BODY_BYTES = int(os.environ.get("ASGI_MAX_BODY_BYTES", 16 * 1024 * 1024))
+
+
+class Overloaded(Exception):
+    pass
+
+
+def cached_translation(code, source_lang, target_lang):
+    """(document key, cached translation or None); hashes and may read disk, so runs on a thread."""
+    key = document_key(code, source_lang, target_lang)
+    return key, document_cache.get(key)
+
+
+def translate_cached(code, source_lang, target_lang):
+    """translate_code() through the document cache, for inputs translated inline."""
+    key, translated = cached_translation(code, source_lang, target_lang)
+    if translated is None:
+        translated = translate_code(code, source_lang, target_lang)
+        document_cache.put(key, translated)
+    return translated
+
+
+class Translator:
+    """Runs translate_code on a process pool with a bound on pending work.
+
+    Admission is decided once per request by admitted(), so a batch is either
+    refused up front or runs to completion; its jobs then wait for one of the
+    pool's slots rather than failing. Requests small enough to be translated
+    inline are always admitted. Nothing that hashes, reads the caches or
+    translates runs on the event loop itself.
+    """
+
+    def __init__(self, workers=WORKERS, max_pending=MAX_PENDING, inline_bytes=INLINE_BYTES):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.inline_bytes = inline_bytes
+        self.pending = 0  # admitted requests not yet answered
+        self.slots = asyncio.Semaphore(workers)  # jobs handed to the pool at once
+        self.pool = None
+
+    def start(self):
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(max_workers=self.workers)
+
+    def shutdown(self):
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+            self.pool = None
+
+    @contextlib.contextmanager
+    def admitted(self, inline=False):
+        """Hold one of max_pending request places; raises Overloaded when none is free.
+
+        A request translated wholly inline (inline=True) takes no place.
+        """
+        if inline:
+            yield
+            return
+        if self.pending >= self.max_pending:
+            raise Overloaded()
+        self.pending += 1
+        try:
+            yield
+        finally:
+            self.pending -= 1
+
+    def fits_inline(self, code):
+        return len(code) <= self.inline_bytes
+
+    async def translate(self, code, source_lang, target_lang, inline=None):
+        """Async wrapper around translate_code.
+
+        inline says whether to translate on a thread instead of the pool; by
+        default inputs of up to inline_bytes are.
+        """
+        if inline is None:
+            inline = self.fits_inline(code)
+        if inline:
+            return await asyncio.to_thread(translate_cached, code, source_lang, target_lang)
+        key, translated = await asyncio.to_thread(cached_translation, code, source_lang, target_lang)
+        if translated is not None:
+            return translated
+        self.start()
+        async with self.slots:
+            loop = asyncio.get_running_loop()
+            translated = await loop.run_in_executor(self.pool, translate_code, code, source_lang, target_lang)
+        await asyncio.to_thread(document_cache.put, key, translated)
+        return translated
+
+
+# ---------------- ASGI APP ----------------
+async def read_body(receive, limit=MAX_BODY_BYTES):
+    chunks = []
+    size = 0
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return None
+        chunk = message.get("body", b"")
+        size += len(chunk)
+        if size > limit:
+            raise RequestEntityTooLarge()
+        chunks.append(chunk)
+        if not message.get("more_body"):
+            return b"".join(chunks)
+
+
+async def send_response(send, status, body, content_type="text/plain; charset=utf-8", headers=()):
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", content_type.encode()), (b"content-length", str(len(body)).encode()),
+                    *headers],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class TranslationApp:
+    def __init__(self, translator=None, fallback=None):
+        self.translator = translator or Translator()
+        if fallback is None and WsgiToAsgi is not None:
+            fallback = WsgiToAsgi(flask_app)
+        self.fallback = fallback
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            return await self.lifespan(receive, send)
+        if scope["type"] != "http":
+            return
+        route = (scope["method"], scope["path"])
+        if route == ("GET", "/healthz"):
+            return await send_response(send, 200, "ok")
+        if route == ("POST", "/translate"):
+            return await self.handle(self.translate_text, scope, receive, send)
+        if route == ("POST", "/api/translate"):
+            return await self.handle(self.translate_jobs, scope, receive, send)
+        if self.fallback is not None:
+            return await self.fallback(scope, receive, send)
+        await send_response(send, 404, "not found")
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                self.translator.start()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self.translator.shutdown()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def handle(self, handler, scope, receive, send):
+        headers = dict(scope.get("headers", ()))
+        try:
+            body = await read_body(receive)
+            if body is None:
+                return
+            coding = headers.get(b"content-encoding", b"").decode().strip().lower()
+            if coding and coding != "identity":
+                if coding not in encodings():
+                    # as CompressionMiddleware answers it (RFC 9110, 15.5.16)
+                    return await send_response(send, 415, f"unsupported content-encoding {coding!r}")
+                body = await asyncio.to_thread(decompress, body, coding)
+            status, content_type, payload = await handler(scope, body)
+        except Overloaded:
+            return await send_response(send, 503, "translation queue full, retry later",
+                                       headers=[(b"retry-after", b"1")])
+        except RequestEntityTooLarge:
+            return await send_response(send, 413, "request body too large")
+        except ValueError as e:
+            return await send_response(send, 400, str(e))
+        if isinstance(payload, str):
+            payload = payload.encode("utf-8")
+        extra = [(b"vary", b"Accept-Encoding"), (b"x-translator-version", translator_fingerprint().encode())]
+        encoding = negotiate(headers.get(b"accept-encoding", b"").decode())
+        if encoding and len(payload) >= COMPRESS_MIN_BYTES and compressible(content_type):
+            payload = await asyncio.to_thread(compress, payload, encoding)
+            extra.append((b"content-encoding", encoding.encode()))
+        await send_response(send, status, payload, content_type, extra)
+
+    async def translate_text(self, scope, body):
+        """POST /translate?source_lang=..&target_lang=.. with the source code as the body."""
+        query = parse_qs(scope.get("query_string", b"").decode())
+        source_lang = query.get("source_lang", [""])[0].lower()
+        target_lang = query.get("target_lang", [""])[0].lower()
+        if source_lang not in languages or target_lang not in languages:
+            raise ValueError("source_lang and target_lang must be supported languages")
+        code = body.decode("utf-8", "replace")
+        inline = self.translator.fits_inline(code)
+        with self.translator.admitted(inline):
+            translated = await self.translator.translate(code, source_lang, target_lang, inline)
+        return 200, "text/plain; charset=utf-8", translated
+
+    async def translate_jobs(self, scope, body):
+        """Same contract as the Flask /api/translate route."""
+        try:
+            jobs = json.loads(body)
+        except json.JSONDecodeError:
+            raise ValueError("expected a JSON array of jobs")
+        if isinstance(jobs, dict):
+            jobs = jobs.get("jobs")
+        if not isinstance(jobs, list):
+            raise ValueError("expected a JSON array of jobs")
+        if len(jobs) > API_MAX_JOBS:
+            raise ValueError(f"at most {API_MAX_JOBS} jobs per request")
+        # inline budget shared by the batch: the first jobs that fit in it run on the loop
+        budget = self.translator.inline_bytes
+        inline = []
+        for job in jobs:
+            size = len(job["code"]) if isinstance(job, dict) and isinstance(job.get("code"), str) else 0
+            inline.append(size <= budget)
+            if size <= budget:
+                budget -= size
+        with self.translator.admitted(all(inline)):
+            results = await asyncio.gather(*(self.translate_job(job, fits) for job, fits in zip(jobs, inline)))
+        return 200, "application/json", json.dumps(results, separators=(",", ":"))
+
+    async def translate_job(self, job, inline=None):
+        if not isinstance(job, dict) or not isinstance(job.get("code"), str):
+            return {"error": "job must be an object with a string code"}
+        source_lang = str(job.get("source_lang", "")).lower()
+        target_lang = str(job.get("target_lang", "")).lower()
+        if source_lang not in languages or target_lang not in languages:
+            return {"error": f"unsupported language pair {source_lang!r} -> {target_lang!r}"}
+        return await self.translator.translate(job["code"], source_lang, target_lang, inline)
+
+
+app = TranslationApp()
@@ -0,0 +1,249 @@
+# batch.py
+import argparse
+import itertools
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from flaskapp import (apply_indent, file_lines, join_chunks, languages, translate_code, translate_lines,
+                      translate_stream, uses_ast_frontend)
+
+# ---------------- FILE EXTENSIONS ----------------
+SOURCE_EXTENSIONS = {
+    ".py": "python",
+    ".java": "java",
+    ".c": "c",
+    ".h": "c",
+    ".cpp": "c++",
+    ".cc": "c++",
+    ".cxx": "c++",
+    ".hpp": "c++",
+    ".cs": "c#",
+    ".js": "javascript",
+    ".mjs": "javascript",
+    ".cjs": "javascript",
+}
+
+TARGET_EXTENSIONS = {
+    "python": ".py",
+    "java": ".java",
+    "c": ".c",
+    "c++": ".cpp",
+    "c#": ".cs",
+    "javascript": ".js",
+}
+
+
+def language_for(path):
+    return SOURCE_EXTENSIONS.get(os.path.splitext(path)[1].lower())
+
+
+def find_sources(src_dir, source_lang=None, skip_dir=None):
+    """Yield (relative path, source language) for every translatable file under src_dir."""
+    skip_dir = os.path.abspath(skip_dir) if skip_dir else None
+    for root, dirs, files in os.walk(src_dir):
+        dirs[:] = sorted(d for d in dirs if os.path.abspath(os.path.join(root, d)) != skip_dir)
+        for name in sorted(files):
+            lang = language_for(name)
+            if lang and (source_lang is None or lang == source_lang):
+                path = os.path.join(root, name)
+                yield os.path.relpath(path, src_dir), lang
+
+
+# ---------------- WORKER ----------------
+def translate_file(job):
+    """Translate one file; returns (relative path, line count, error message or None)."""
+    rel_path, src_path, out_path, source_lang, target_lang = job
+    try:
+        with open(src_path, encoding="utf-8") as f:
+            code = f.read()
+        translated = translate_code(code, source_lang, target_lang)
+        os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+        with open(out_path, "w", encoding="utf-8") as f:
+            f.write(translated)
+        return rel_path, code.count("\n") + 1, None
+    except Exception as e:  # reported per file, the batch keeps going
+        return rel_path, 0, f"{type(e).__name__}: {e}"
+
+
+def translate_chunk(job):
+    lines, source_lang, target_lang = job
+    return list(translate_lines(lines, source_lang, target_lang))
+
+
+# ---------------- SINGLE LARGE FILE ----------------
+# Lines per chunk handed to a worker when splitting one document.
+CHUNK_LINES = 50_000
+
+
+def translate_code_parallel(code, source_lang, target_lang, workers=None, chunk_lines=CHUNK_LINES):
+    """Translate one large document across worker processes.
+
+    Chunks go through the line-local translate_lines() in parallel; apply_indent()
+    then runs once, in order, over the re-joined results. That sequential pass is
+    the only place state crosses chunk boundaries, so the output is byte-identical
+    to translate_code().
+    """
+    if uses_ast_frontend(source_lang, target_lang):
+        return translate_code(code, source_lang, target_lang)  # a module is parsed as a whole
+    lines = code.splitlines()
+    if len(lines) <= chunk_lines:
+        return translate_code(code, source_lang, target_lang)
+    jobs = [(lines[i:i + chunk_lines], source_lang, target_lang)
+            for i in range(0, len(lines), chunk_lines)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        t_lines = itertools.chain.from_iterable(pool.map(translate_chunk, jobs))
+        return "\n".join(apply_indent(t_lines, target_lang))
+
+
+def translate_large_file(src_path, out_path, target_lang, source_lang=None, workers=None,
+                         chunk_lines=CHUNK_LINES):
+    """Translate a single file with translate_code_parallel(); returns a BatchReport."""
+    source_lang = source_lang or language_for(src_path)
+    if source_lang is None:
+        raise ValueError(f"cannot infer source language of {src_path}; pass source_lang")
+    report = BatchReport()
+    start = time.perf_counter()
+    with open(src_path, encoding="utf-8") as f:
+        code = f.read()
+    translated = translate_code_parallel(code, source_lang, target_lang.lower(), workers, chunk_lines)
+    with open(out_path, "w", encoding="utf-8") as f:
+        f.write(translated)
+    report.files = 1
+    report.lines = code.count("\n") + 1
+    report.elapsed = time.perf_counter() - start
+    return report
+
+
+def translate_large_file_streaming(src_path, out_path, target_lang, source_lang=None):
+    """Translate a single file in one process, in flat memory however large it is.
+
+    The source is read line by line through a memory map and the output written
+    as it is produced, so neither is ever held whole. Always line-based, even when
+    PYTHON_FRONTEND=ast.
+    """
+    source_lang = source_lang or language_for(src_path)
+    if source_lang is None:
+        raise ValueError(f"cannot infer source language of {src_path}; pass source_lang")
+    report = BatchReport()
+    start = time.perf_counter()
+    lines = 0
+
+    def counted(source):
+        nonlocal lines
+        for line in source:
+            lines += 1
+            yield line
+
+    translated = translate_stream(counted(file_lines(src_path)), source_lang, target_lang.lower())
+    with open(out_path, "w", encoding="utf-8") as f:
+        f.writelines(join_chunks(translated))
+    report.files = 1
+    report.lines = lines
+    report.elapsed = time.perf_counter() - start
+    return report
+
+
+# ---------------- BATCH API ----------------
+class BatchReport:
+    def __init__(self):
+        self.files = 0
+        self.lines = 0
+        self.errors = []
+        self.elapsed = 0.0
+
+    @property
+    def files_per_sec(self):
+        return self.files / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def lines_per_sec(self):
+        return self.lines / self.elapsed if self.elapsed else 0.0
+
+    def summary(self):
+        return (f"{self.files} files ({len(self.errors)} failed), {self.lines} lines in "
+                f"{self.elapsed:.2f}s: {self.files_per_sec:,.1f} files/sec, "
+                f"{self.lines_per_sec:,.0f} lines/sec")
+
+
+def translate_tree(src_dir, out_dir, target_lang, source_lang=None, workers=None,
+                   chunksize=16, progress=None):
+    """Translate every recognised source file under src_dir into a mirrored tree under out_dir.
+
+    Files are fanned out over a process pool; progress(done, total, rel_path, error)
+    is called in the parent as results arrive.
+    """
+    target_lang = target_lang.lower()
+    target_ext = TARGET_EXTENSIONS[target_lang]
+    jobs = []
+    claimed = set()
+    for rel_path, lang in find_sources(src_dir, source_lang, skip_dir=out_dir):
+        out_rel = os.path.splitext(rel_path)[0] + target_ext
+        if out_rel in claimed:
+            # e.g. util.c and util.py both translated to Java: keep util.c.java apart
+            out_rel = rel_path + target_ext
+        claimed.add(out_rel)
+        out_path = os.path.join(out_dir, out_rel)
+        jobs.append((rel_path, os.path.join(src_dir, rel_path), out_path, lang, target_lang))
+
+    report = BatchReport()
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for done, (rel_path, n_lines, error) in enumerate(pool.map(translate_file, jobs, chunksize=chunksize), 1):
+            report.files += 1
+            report.lines += n_lines
+            if error:
+                report.errors.append((rel_path, error))
+            if progress:
+                progress(done, len(jobs), rel_path, error)
+    report.elapsed = time.perf_counter() - start
+    return report
+
+
+# ---------------- CLI ----------------
+def print_progress(done, total, rel_path, error):
+    status = "FAILED " if error else ""
+    sys.stderr.write(f"\r\033[K[{done}/{total}] {status}{rel_path}")
+    if done == total:
+        sys.stderr.write("\n")
+    sys.stderr.flush()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Translate a whole source tree, or one large file, into another language")
+    parser.add_argument("src", help="source directory, or a single file to split across workers")
+    parser.add_argument("out", help="output directory (or output file when src is a file)")
+    parser.add_argument("--target", required=True, choices=languages)
+    parser.add_argument("--source", choices=languages,
+                        help="only translate files of this language (default: infer from extension)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--chunksize", type=int, default=16, help="files handed to a worker at a time")
+    parser.add_argument("--chunk-lines", type=int, default=CHUNK_LINES,
+                        help="lines per worker chunk when src is a single file")
+    parser.add_argument("--stream", action="store_true",
+                        help="when src is a file, translate it in one process in flat memory")
+    parser.add_argument("--quiet", action="store_true", help="no progress output")
+    args = parser.parse_args(argv)
+
+    if os.path.isfile(args.src) and args.stream:
+        report = translate_large_file_streaming(args.src, args.out, args.target, args.source)
+        print(report.summary())
+        return 0
+
+    if os.path.isfile(args.src):
+        report = translate_large_file(args.src, args.out, args.target, args.source, args.workers,
+                                      args.chunk_lines)
+        print(report.summary())
+        return 0
+
+    report = translate_tree(args.src, args.out, args.target, args.source, args.workers,
+                            args.chunksize, None if args.quiet else print_progress)
+    for rel_path, error in report.errors:
+        print(f"error: {rel_path}: {error}", file=sys.stderr)
+    print(report.summary())
+    return 1 if report.errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,602 @@
+# benchmark.py
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+import compression
+
+from flaskapp import CodeTranslator, languages, translate_code
+from frontends import PythonFrontend
+from incremental import IncrementalTranslation, translate_incremental
+
+# ---------------- CORPORA ----------------
+# Synthetic samples are repeated with a counter substituted for {n}, so identifiers
+# vary between repetitions; realistic samples are small programs repeated verbatim.
+SYNTHETIC = {
+    "python": """import os
+# compute totals
+def add_{n}(a, b):
+    return a + b
+class Shape{n}(Base):
+    def __init__(self, size):
+        self.size = size
+total_{n} = 0
+if total_{n} > 10 and not done:
+    print("big")
+elif total_{n} == None:
+    print(total_{n})
+else:
+    print('small')
+for i in range({n}):
+    total_{n} = total_{n} + i
+for item in items:
+    results.append(item)
+while total_{n} < 100:
+    total_{n} = total_{n} * 2
+try:
+    run()
+except ValueError as e:
+    print(e)
+finally:
+    cleanup()
+squares = [x * x for x in range({n})]
+double = lambda x: x * 2
+parts = line.split(",")
+""",
+    "java": """import java.util.List;
+// compute totals
+public class Shape{n} {{
+    public static int add{n}(int a, int b) {{
+        int total{n} = a + b;
+        String label = "shape{n}";
+        if (total{n} > 10 && !done) {{
+            System.out.println("big");
+        }} else if (total{n} == null) {{
+            System.out.println(total{n});
+        }} else {{
+            System.out.println("small");
+        }}
+        for (int i = 0; i < {n}; i++) {{
+            total{n} += i;
+        }}
+        boolean ok = true;
+        return total{n};
+    }}
+}}
+""",
+    "c#": """using System;
+// compute totals
+public class Shape{n} {{
+    public static int Add{n}(int a, int b) {{
+        int total{n} = a + b;
+        Console.WriteLine("sum");
+        if (total{n} > 10 || done) {{
+            Console.Write(total{n});
+        }} else {{
+            Console.WriteLine("small");
+        }}
+        for (int i = 0; i < {n}; i++) {{
+            total{n} += i;
+        }}
+        return total{n};
+    }}
+}}
+""",
+    "c": """#include <stdio.h>
+/* compute totals */
+struct Shape{n} {{
+    int size;
+}};
+int add{n}(int a, int b) {{
+    int total{n} = a + b;
+    double ratio = 0.5;
+    char *name = "shape";
+    printf("%d\\n", total{n});
+    scanf("%d", &total{n});
+    if (total{n} > 10) {{
+        total{n} = 0;
+    }}
+    return total{n};
+}}
+""",
+    "javascript": """const fs = require('fs');
+// compute totals
+function add{n}(a, b) {{
+    let total{n} = a + b;
+    console.log("sum " + total{n});
+    const double{n} = (x) => x * 2;
+    var items = [1, 2, {n}];
+    items.push(total{n});
+    items.pop();
+    if (total{n} > 10 && !done) {{
+        total{n} = null;
+    }}
+    return total{n};
+}}
+""",
+}
+SYNTHETIC["c++"] = SYNTHETIC["c"]
+
+REALISTIC = {
+    "python": """import sys
+from collections import defaultdict
+
+# Count word frequencies in a file
+class WordCounter(object):
+    def __init__(self, path):
+        self.path = path
+        self.counts = defaultdict(int)
+
+    def run(self):
+        try:
+            handle = open(self.path)
+        except IOError as e:
+            print("cannot open", e)
+            return None
+        for line in handle:
+            for word in line.split():
+                self.counts[word] += 1
+        words = sorted(self.counts, key=lambda w: -self.counts[w])
+        top = [w for w in words[:10]]
+        return top
+
+def main(argv):
+    if len(argv) < 2 or argv[1] == "":
+        print("usage: wc FILE")
+        return 1
+    counter = WordCounter(argv[1])
+    for i in range(3):
+        result = counter.run()
+    while not result:
+        result = []
+    return 0
+""",
+    "java": """import java.util.HashMap;
+import java.util.Map;
+
+// Count word frequencies in a file
+public class WordCounter {
+    private Map<String, Integer> counts = new HashMap<>();
+
+    public static void main(String[] args) {
+        if (args.length < 1) {
+            System.out.println("usage: WordCounter FILE");
+            return;
+        }
+        int total = 0;
+        String path = args[0];
+        for (int i = 0; i < 3; i++) {
+            total = total + i;
+        }
+        boolean verbose = false;
+        if (total > 2 && !verbose) {
+            System.out.println(total);
+        } else if (path == null) {
+            System.out.print("none");
+        } else {
+            System.out.println(path);
+        }
+    }
+}
+""",
+    "c#": """using System;
+using System.Collections.Generic;
+
+// Count word frequencies in a file
+public class WordCounter {
+    public static void Main(string[] args) {
+        if (args.Length < 1) {
+            Console.WriteLine("usage: WordCounter FILE");
+            return;
+        }
+        int total = 0;
+        string path = args[0];
+        for (int i = 0; i < 3; i++) {
+            total = total + i;
+        }
+        if (total > 2 || path == null) {
+            Console.Write(total);
+        } else {
+            Console.WriteLine(path);
+        }
+    }
+}
+""",
+    "c": """#include <stdio.h>
+#include <string.h>
+
+/* Count characters in standard input */
+struct counter {
+    int chars;
+    int lines;
+};
+
+int main(int argc, char **argv) {
+    struct counter c;
+    int ch = 0;
+    char *name = argv[0];
+    double ratio = 0.0;
+    scanf("%d", &ch);
+    while ((ch = getchar()) != EOF) {
+        c.chars++;
+        if (ch == '\\n') {
+            c.lines++;
+        }
+    }
+    printf("%d\\n", c.chars);
+    printf("lines: %d\\n", c.lines);
+    return 0;
+}
+""",
+    "javascript": """const fs = require('fs');
+const path = require('path');
+
+// Count word frequencies in a file
+function countWords(file) {
+    const text = fs.readFileSync(file, 'utf8');
+    let counts = {};
+    var words = text.split(/\\s+/);
+    words.forEach((w) => counts[w] = (counts[w] || 0) + 1);
+    const top = (n) => Object.keys(counts).slice(0, n);
+    let result = top(10);
+    result.push('total');
+    result.shift();
+    if (result.length === 0 && !file) {
+        result = null;
+    }
+    console.log(result);
+    return result;
+}
+""",
+}
+REALISTIC["c++"] = REALISTIC["c"]
+
+
+def make_corpus(source_lang, kind, n_lines):
+    """Return n_lines of source_lang code from the synthetic or realistic samples."""
+    lines = []
+    n = 0
+    while len(lines) < n_lines:
+        if kind == "synthetic":
+            lines.extend(SYNTHETIC[source_lang].format(n=n).splitlines())
+        else:
+            lines.extend(REALISTIC[source_lang].splitlines())
+        n += 1
+    return lines[:n_lines]
+
+
+def python_corpus(n_lines):
+    return make_corpus("python", "synthetic", n_lines)
+
+
+# Condition-heavy input for the translate_condition microbenchmark, per source family.
+CONDITIONS = {
+    "python": ["x_{n} > 1 and not done", "a_{n} is not None or b is None", "ok_{n} == True and s != 'a or b'",
+               "not (x_{n} or y) and z is None"],
+    "c": ["x_{n} > 1 && !done", "a_{n} != NULL || b == NULL", "ok_{n} == true && !(s || t)",
+          "(!x_{n}) || y != 0"],
+    "javascript": ["x_{n} > 1 && !done", "a_{n} !== null || b === undefined", "ok_{n} === true && s != \"a || b\"",
+                   "!(x_{n} || y) && z !== null"],
+}
+
+
+def condition_corpus(source_lang, n_conditions):
+    samples = CONDITIONS.get(source_lang, CONDITIONS["c"])
+    return [samples[i % len(samples)].format(n=i) for i in range(n_conditions)]
+
+
+# ---------------- MEASUREMENTS ----------------
+# Throughput and latency time CodeTranslator.translate_line directly with no line cache:
+# translate_code also re-indents, and for Python sources (no closing braces) the
+# indent prefix grows with the file length.
+def lines_per_second(lines, source_lang, target_lang, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        translator = CodeTranslator(source_lang, target_lang)
+        start = time.perf_counter()
+        for line in lines:
+            translator.translate_line(line)
+        best = min(best, time.perf_counter() - start)
+    return len(lines) / best
+
+
+def latency_percentiles(lines, source_lang, target_lang):
+    """Per-line translate_line latency in microseconds: p50, p90, p99."""
+    translator = CodeTranslator(source_lang, target_lang)
+    clock = time.perf_counter_ns
+    samples = []
+    for line in lines:
+        start = clock()
+        translator.translate_line(line)
+        samples.append(clock() - start)
+    cuts = statistics.quantiles(samples, n=100)
+    return {f"p{p}_us": round(cuts[p - 1] / 1000, 3) for p in (50, 90, 99)}
+
+
+def peak_memory_kib(lines, source_lang, target_lang):
+    """Peak traced allocation while translate_code runs over the whole corpus."""
+    code = "\n".join(lines)
+    tracemalloc.start()
+    try:
+        translate_code(code, source_lang, target_lang, cache=None)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return round(peak / 1024, 1)
+
+
+def conditions_per_second(source_lang, target_lang, n_conditions, repeat):
+    """translate_condition throughput on unique conditions (no line or lex cache hits)."""
+    conditions = condition_corpus(source_lang, n_conditions)
+    translator = CodeTranslator(source_lang, target_lang)
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for cond in conditions:
+            translator.translate_condition(cond)
+        best = min(best, time.perf_counter() - start)
+    return round(n_conditions / best)
+
+
+def count_nodes(nodes):
+    total = 0
+    for node in nodes:
+        total += 1
+        for field in ("body", "orelse", "handlers", "finalbody"):
+            total += count_nodes(getattr(node, field, ()))
+    return total
+
+
+def block_bytes_per_node(n_lines):
+    """Traced bytes held by the pyblocks tree of a python corpus (the ast is freed first), per node."""
+    sample_lines = SYNTHETIC["python"].count("\n")
+    reps = -(-n_lines // sample_lines)  # whole samples only, so the module parses
+    frontend = PythonFrontend("".join(SYNTHETIC["python"].format(n=n) for n in range(reps)))
+    tracemalloc.start()
+    try:
+        module = frontend.lower()
+        del frontend
+        held, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    nodes = count_nodes(module.body)
+    return {"nodes": nodes, "bytes_per_node": round(held / nodes, 1)}
+
+
+def incremental_edit_ms(source_lang, target_lang, n_lines, repeat):
+    """Median latency of one-line edits spread over the document.
+
+    edit: IncrementalTranslation.edit() on a document kept between edits.
+    stateless: translate_incremental() from the source and its translation, as a
+    client that holds only the two would call it.
+    """
+    lines = make_corpus(source_lang, "synthetic", n_lines)
+    code = "\n".join(lines)
+    translation = translate_code(code, source_lang, target_lang, cache=None)
+    document = IncrementalTranslation(code, source_lang, target_lang, cache=None)
+    samples = {"edit": [], "stateless": []}
+    for i in range(max(repeat, 1) * 10):
+        index = (i * 7919) % len(lines)
+        text = lines[index] + " "  # a keystroke that keeps the brace balance
+        start = time.perf_counter()
+        document.edit(index, index + 1, text)
+        samples["edit"].append(time.perf_counter() - start)
+        start = time.perf_counter()
+        translate_incremental(code, translation, index, index + 1, text, source_lang, target_lang, cache=None)
+        samples["stateless"].append(time.perf_counter() - start)
+    return {name: round(statistics.median(times) * 1000, 3) for name, times in samples.items()}
+
+
+# Request sizes for the compression benchmark: a snippet, a file, a module, a generated source.
+COMPRESSION_SIZES = [1024, 16 * 1024, 256 * 1024, 4 * 1024 * 1024]
+
+
+def compression_costs(source_lang, size, repeat):
+    """Bytes saved and CPU time per coding for one payload of about size bytes of source."""
+    lines = make_corpus(source_lang, "synthetic", size // 20 + 10)
+    payload = "\n".join(lines).encode()[:size]
+    results = {}
+    for encoding in compression.encodings():
+        best_c = best_d = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            packed = compression.compress(payload, encoding)
+            best_c = min(best_c, time.perf_counter() - start)
+            start = time.perf_counter()
+            compression.decompress(packed, encoding)
+            best_d = min(best_d, time.perf_counter() - start)
+        results[encoding] = {"bytes": len(payload), "compressed": len(packed),
+                             "ratio": round(len(payload) / len(packed), 2),
+                             "compress_ms": round(best_c * 1000, 3), "decompress_ms": round(best_d * 1000, 3)}
+    return results
+
+
+# Run in a fresh interpreter: time from `import flaskapp` through the first translated response.
+STARTUP_SCRIPT = """
+import json, time
+start = time.perf_counter()
+import flaskapp
+imported = time.perf_counter()
+job = {"code": "if a and not b:\\n    print(x)", "source_lang": "python", "target_lang": "java"}
+assert flaskapp.app.test_client().post("/api/translate", json=[job]).status_code == 200
+done = time.perf_counter()
+print(json.dumps({"import_ms": (imported - start) * 1000, "first_response_ms": (done - imported) * 1000}))
+"""
+
+
+def startup_ms(repeat, warm_up=None):
+    """Best import and first-response times over repeat fresh processes; warm_up sets WARM_UP."""
+    env = dict(os.environ)
+    env.pop("WARM_UP", None)
+    if warm_up:
+        env["WARM_UP"] = warm_up
+    here = os.path.dirname(os.path.abspath(__file__))
+    best = {}
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-c", STARTUP_SCRIPT], cwd=here, env=env, check=True,
+                             capture_output=True, text=True).stdout
+        for key, value in json.loads(out.splitlines()[-1]).items():
+            best[key] = round(min(best.get(key, value), value), 2)
+    return best
+
+
+def threaded_requests(source_lang, target_lang, threads, n_requests, request_lines=40):
+    """Small translate_code requests spread over a thread pool, as a threaded server runs them.
+
+    Returns requests/sec and the per-request cost of creating the CodeTranslator,
+    which is all that is not shared between threads.
+    """
+    code = "\n".join(make_corpus(source_lang, "synthetic", request_lines))
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        start = time.perf_counter()
+        list(pool.map(lambda _: translate_code(code, source_lang, target_lang, cache=None), range(n_requests)))
+        elapsed = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(n_requests):
+        CodeTranslator(source_lang, target_lang)
+    setup_us = (time.perf_counter() - start) / n_requests * 1e6
+    return {"requests_per_sec": round(n_requests / elapsed), "setup_us": round(setup_us, 3)}
+
+
+def bench_pair(lines, source_lang, target_lang, repeat, memory_lines):
+    result = {"lines_per_sec": round(lines_per_second(lines, source_lang, target_lang, repeat))}
+    result.update(latency_percentiles(lines, source_lang, target_lang))
+    result["peak_kib"] = peak_memory_kib(lines[:memory_lines], source_lang, target_lang)
+    return result
+
+
+def run_suite(sources, targets, corpora, n_lines, repeat, memory_lines, log=None):
+    """Benchmark every (corpus, source, target) combination; returns a JSON-ready dict."""
+    results = {}
+    for kind in corpora:
+        for source_lang in sources:
+            lines = make_corpus(source_lang, kind, n_lines)
+            for target_lang in targets:
+                key = f"{kind}:{source_lang}->{target_lang}"
+                results[key] = bench_pair(lines, source_lang, target_lang, repeat, memory_lines)
+                if log:
+                    log(key, results[key])
+    return {
+        "meta": {"lines": n_lines, "repeat": repeat, "memory_lines": memory_lines,
+                 "python": sys.version.split()[0], "time": time.strftime("%Y-%m-%dT%H:%M:%S")},
+        "results": results,
+    }
+
+
+# ---------------- COMPARISON ----------------
+def compare(baseline, current, threshold):
+    """Return a list of (key, baseline rate, current rate) where throughput dropped past threshold."""
+    regressions = []
+    for key, result in current["results"].items():
+        old = baseline["results"].get(key)
+        if old and result["lines_per_sec"] < old["lines_per_sec"] * (1 - threshold):
+            regressions.append((key, old["lines_per_sec"], result["lines_per_sec"]))
+    return regressions
+
+
+def print_result(key, result):
+    print(f"  {key:<34}{result['lines_per_sec']:>12,} lines/sec  p50 {result['p50_us']:>7.2f}us  "
+          f"p99 {result['p99_us']:>7.2f}us  peak {result['peak_kib']:>9,.1f} KiB")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark CodeTranslator across language pairs")
+    parser.add_argument("--source", action="append", choices=languages,
+                        help="source language(s) to run (default: all)")
+    parser.add_argument("--target", action="append", choices=languages,
+                        help="target language(s) to run (default: all)")
+    parser.add_argument("--corpus", action="append", choices=["synthetic", "realistic"],
+                        help="corpus kind(s) to run (default: both)")
+    parser.add_argument("--lines", type=int, default=20_000, help="lines per corpus")
+    parser.add_argument("--repeat", type=int, default=3, help="throughput runs, best is kept")
+    parser.add_argument("--memory-lines", type=int, default=2_000,
+                        help="lines fed to translate_code for the peak memory measurement")
+    parser.add_argument("--conditions", action="store_true",
+                        help="only run the translate_condition microbenchmark")
+    parser.add_argument("--threads", type=int, default=0,
+                        help="only run --lines small requests on this many threads and report per-request overhead")
+    parser.add_argument("--startup", action="store_true",
+                        help="only measure import-to-first-response time, lazy and with WARM_UP=all")
+    parser.add_argument("--compression", action="store_true",
+                        help="only measure bandwidth saved and CPU cost of request/response compression")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only measure one-line edit latency of IncrementalTranslation")
+    parser.add_argument("--blocks", action="store_true",
+                        help="only measure memory held per pyblocks node for a python corpus")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--compare", help="baseline JSON file to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="allowed throughput drop against the baseline (default: 0.10)")
+    args = parser.parse_args(argv)
+
+    if args.conditions:
+        for source_lang in args.source or languages:
+            for target_lang in args.target or languages:
+                if (source_lang == "python") != (target_lang == "python"):
+                    rate = conditions_per_second(source_lang, target_lang, args.lines, args.repeat)
+                    print(f"  {source_lang + '->' + target_lang:<24}{rate:>12,} conditions/sec")
+        return 0
+
+    if args.threads:
+        for source_lang in args.source or languages:
+            for target_lang in args.target or languages:
+                r = threaded_requests(source_lang, target_lang, args.threads, args.lines)
+                print(f"  {source_lang + '->' + target_lang:<24}{r['requests_per_sec']:>10,} requests/sec  "
+                      f"translator setup {r['setup_us']:>6.3f} us/request")
+        return 0
+
+    if args.startup:
+        for label, warm in (("lazy", None), ("WARM_UP=all", "all")):
+            r = startup_ms(args.repeat, warm)
+            print(f"  {label:<14}import {r['import_ms']:>8.2f} ms  first response {r['first_response_ms']:>7.2f} ms")
+        return 0
+
+    if args.compression:
+        for source_lang in args.source or languages:
+            for size in COMPRESSION_SIZES:
+                for encoding, r in compression_costs(source_lang, size, args.repeat).items():
+                    skipped = " (below COMPRESS_MIN_BYTES)" if size < compression.COMPRESS_MIN_BYTES else ""
+                    print(f"  {source_lang:<11}{size:>9,} B {encoding:<5}{r['compressed']:>9,} B  x{r['ratio']:<6} "
+                          f"compress {r['compress_ms']:>8.3f} ms  decompress {r['decompress_ms']:>7.3f} ms{skipped}")
+        return 0
+
+    if args.incremental:
+        for source_lang in args.source or languages:
+            for target_lang in args.target or languages:
+                ms = incremental_edit_ms(source_lang, target_lang, args.lines, args.repeat)
+                print(f"  {source_lang + '->' + target_lang:<24}{ms['edit']:>10.3f} ms/edit  "
+                      f"{ms['stateless']:>10.3f} ms/translate_incremental (median)")
+        return 0
+
+    if args.blocks:
+        result = block_bytes_per_node(args.lines)
+        print(f"  {result['nodes']:,} pyblocks nodes  {result['bytes_per_node']:,.1f} bytes/node")
+        return 0
+
+    report = run_suite(args.source or languages, args.target or languages,
+                       args.corpus or ["synthetic", "realistic"], args.lines, args.repeat,
+                       args.memory_lines, log=print_result)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, report, args.threshold)
+        for key, old, new in regressions:
+            print(f"REGRESSION {key}: {old:,} -> {new:,} lines/sec ({new / old - 1:+.1%})")
+        if regressions:
+            return 1
+        print(f"no regressions beyond {args.threshold:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
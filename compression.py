@@ -0,0 +1,223 @@
+# compression.py
+# Content-Encoding support for the translation endpoints: compressed request bodies
+# are decoded while they are read, and responses are compressed as they are sent,
+# so neither direction buffers a whole payload. zstd needs the optional
+# `zstandard` package; gzip always works.
+import gzip
+import io
+import os
+import zlib
+
+from werkzeug.datastructures import Accept
+from werkzeug.exceptions import BadRequest, RequestEntityTooLarge
+from werkzeug.http import parse_accept_header, parse_etags, quote_etag, unquote_etag
+from werkzeug.wsgi import ClosingIterator, LimitedStream, get_content_length
+
+try:
+    import zstandard
+except ImportError:  # optional: without it only gzip is offered and accepted
+    zstandard = None
+
+DECODE_ERRORS = (zlib.error, zstandard.ZstdError) if zstandard is not None else (zlib.error,)
+
+# ---------------- SETTINGS ----------------
+# Responses with a known length below this are sent uncompressed; streamed ones are always compressed.
+COMPRESS_MIN_BYTES = int(os.environ.get("COMPRESS_MIN_BYTES", 1024))
+GZIP_LEVEL = int(os.environ.get("GZIP_LEVEL", 6))
+ZSTD_LEVEL = int(os.environ.get("ZSTD_LEVEL", 3))
+# Largest decoded request body accepted, against decompression bombs.
+MAX_DECODED_BYTES = int(os.environ.get("MAX_DECODED_BYTES", 256 * 1024 * 1024))
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/javascript")
+# environ key under which the middleware keeps a decoded body's Content-Length as sent.
+WIRE_LENGTH_KEY = "compression.wire_length"
+
+
+def encodings():
+    """Codings this process can produce, in order of preference."""
+    return ["zstd", "gzip"] if zstandard is not None else ["gzip"]
+
+
+def negotiate(accept_encoding):
+    """Pick a response coding from an Accept-Encoding header value, or None for identity."""
+    if not accept_encoding:
+        return None
+    return parse_accept_header(accept_encoding, Accept).best_match(encodings())
+
+
+# ---------------- CODECS ----------------
+def compressor(encoding):
+    """Return an object with compress(data) and flush() for encoding."""
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+    return zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)  # wbits 31: gzip header and trailer
+
+
+def compress(data, encoding):
+    c = compressor(encoding)
+    return c.compress(data) + c.flush()
+
+
+def decoding_reader(stream, encoding):
+    """Wrap a binary stream so reads return decoded bytes; ValueError for an unknown coding."""
+    if encoding == "gzip":
+        return gzip.GzipFile(fileobj=stream, mode="rb")
+    if encoding == "zstd" and zstandard is not None:
+        return zstandard.ZstdDecompressor().stream_reader(stream)
+    raise ValueError(f"unsupported content-encoding {encoding!r}")
+
+
+class DecodedBody(io.RawIOBase):
+    """A decoding reader over a request body that answers 413 once more than limit bytes come out, 400 when malformed."""
+
+    def __init__(self, reader, limit):
+        self.reader = reader
+        self.limit = limit
+        self.total = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        try:
+            n = self.reader.readinto(b)
+        except DECODE_ERRORS + (EOFError, OSError) as e:
+            raise BadRequest(f"malformed request body: {e}")
+        self.total += n
+        if self.total > self.limit:
+            raise RequestEntityTooLarge()
+        return n
+
+
+def decompress(data, encoding, limit=MAX_DECODED_BYTES):
+    """Decode a whole body; ValueError when the coding is unknown or the data malformed.
+
+    At most limit + 1 bytes are ever decoded, whatever sizes the data declares;
+    RequestEntityTooLarge when the result is over limit.
+    """
+    try:
+        if encoding == "gzip":
+            out = zlib.decompressobj(31).decompress(data, limit + 1)
+        elif encoding == "zstd" and zstandard is not None:
+            chunks, size = [], 0
+            with zstandard.ZstdDecompressor().stream_reader(io.BytesIO(data)) as reader:
+                while size <= limit:
+                    chunk = reader.read(min(limit + 1 - size, 1 << 16))
+                    if not chunk:
+                        break
+                    chunks.append(chunk)
+                    size += len(chunk)
+            out = b"".join(chunks)
+        else:
+            raise ValueError(f"unsupported content-encoding {encoding!r}")
+    except DECODE_ERRORS as e:
+        raise ValueError(f"malformed {encoding} body: {e}")
+    if len(out) > limit:
+        raise RequestEntityTooLarge()
+    return out
+
+
+def compressed_chunks(chunks, encoding):
+    """Compress an iterable of byte chunks as they arrive."""
+    c = compressor(encoding)
+    for chunk in chunks:
+        out = c.compress(chunk)
+        if out:
+            yield out
+    yield c.flush()
+
+
+def compressible(content_type):
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+# ---------------- ETAGS ----------------
+# A compressed response is a different representation, so it gets its own ETag:
+# the app's tag with the coding appended ("abc" -> "abc-gzip"). If-None-Match is
+# mapped back before the app compares it with its own tags.
+def coded_etag(value, encoding):
+    etag, weak = unquote_etag(value)
+    return quote_etag(f"{etag}-{encoding}", weak)
+
+
+def app_if_none_match(header, encoding):
+    """Return header with the coded_etag()s of encoding turned back into the app's, and the tags so turned."""
+    etags = parse_etags(header)
+    if etags.star_tag:
+        return header, set()
+    suffix = "-" + encoding
+    strong = etags.as_set()
+    app_tags, restored = [], set()
+    for tags, weak in ((strong, False), (etags.as_set(include_weak=True) - strong, True)):
+        for etag in sorted(tags):
+            if etag.endswith(suffix):
+                etag = etag[:-len(suffix)]
+                restored.add(etag)
+            app_tags.append(quote_etag(etag, weak))
+    return ", ".join(app_tags), restored
+
+
+# ---------------- WSGI ----------------
+class CompressionMiddleware:
+    """Decode Content-Encoding request bodies and compress responses the client accepts."""
+
+    def __init__(self, app, min_bytes=COMPRESS_MIN_BYTES, max_decoded=MAX_DECODED_BYTES):
+        self.app = app
+        self.min_bytes = min_bytes
+        self.max_decoded = max_decoded
+
+    def __call__(self, environ, start_response):
+        coding = environ.get("HTTP_CONTENT_ENCODING", "").strip().lower()
+        if coding and coding != "identity":
+            # read no further than Content-Length, then decode lazily up to max_decoded
+            stream = environ["wsgi.input"]
+            length = get_content_length(environ)
+            if length is not None:
+                stream = LimitedStream(stream, length)
+            try:
+                stream = decoding_reader(stream, coding)
+            except ValueError as e:
+                start_response("415 Unsupported Media Type", [("Content-Type", "text/plain; charset=utf-8")])
+                return [str(e).encode()]
+            environ["wsgi.input"] = DecodedBody(stream, self.max_decoded)
+            environ["wsgi.input_terminated"] = True
+            environ[WIRE_LENGTH_KEY] = length
+            environ.pop("CONTENT_LENGTH", None)
+            del environ["HTTP_CONTENT_ENCODING"]
+
+        encoding = negotiate(environ.get("HTTP_ACCEPT_ENCODING"))
+        if environ.get("REQUEST_METHOD") == "HEAD":
+            encoding = None  # no body to compress; the headers still say it varies
+        restored = set()
+        if encoding is not None and environ.get("HTTP_IF_NONE_MATCH"):
+            environ["HTTP_IF_NONE_MATCH"], restored = app_if_none_match(environ["HTTP_IF_NONE_MATCH"], encoding)
+
+        chosen = []
+
+        def start(status, headers, exc_info=None):
+            names = {name.lower(): value for name, value in headers}
+            length = names.get("content-length")
+            etag = names.get("etag")
+            if (encoding is not None and status[:3] in ("200", "201") and "content-encoding" not in names
+                    and "content-range" not in names and compressible(names.get("content-type", ""))
+                    and (length is None or int(length) >= self.min_bytes)):
+                chosen.append(encoding)
+                headers = [(name, value) for name, value in headers if name.lower() != "content-length"]
+                headers.append(("Content-Encoding", encoding))
+            elif not (status[:3] == "304" and etag and unquote_etag(etag)[0] in restored):
+                etag = None  # the app's representation is sent, under the app's tag
+            if etag:
+                headers = [(name, value) for name, value in headers if name.lower() != "etag"]
+                headers.append(("ETag", coded_etag(etag, encoding)))
+            if status[:3] in ("200", "201", "304"):
+                vary = names.get("vary")
+                if not vary:
+                    headers.append(("Vary", "Accept-Encoding"))
+                elif "accept-encoding" not in vary.lower() and vary.strip() != "*":
+                    headers = [(name, value) for name, value in headers if name.lower() != "vary"]
+                    headers.append(("Vary", f"{vary}, Accept-Encoding"))
+            return start_response(status, headers, exc_info)
+
+        app_iter = self.app(environ, start)
+        if not chosen:
+            return app_iter
+        return ClosingIterator(compressed_chunks(app_iter, encoding), getattr(app_iter, "close", None))
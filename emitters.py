@@ -0,0 +1,230 @@
+# emitters.py
+import pyblocks
+
+# Parameter and declaration types for untyped sources, per brace target.
+PARAM_TYPES = {"java": "Object", "c#": "Object", "c": "int", "c++": "int"}
+
+
+class BraceEmitter:
+    """Write a pyblocks.Module lowered from Python as lines of a brace-delimited target language.
+
+    Block structure (headers, closing braces, indentation) is decided here;
+    conditions, comments, imports and simple statements are still Python text
+    and go through the CodeTranslator passed in, so they read the same as in
+    the line-based mode.
+    """
+
+    def __init__(self, translator, indent="    "):
+        self.translator = translator
+        self.target = translator.target_lang
+        self.indent = indent
+        self.depth = 0
+        self.owners = []  # enclosing class names, None for an enclosing function
+        self.out = []
+
+    def emit(self, module):
+        self.body(module.body)
+        return self.out
+
+    # ---------------- HELPERS ----------------
+    def line(self, text):
+        for part in text.split("\n"):
+            self.out.append(self.indent * self.depth + part if part else "")
+
+    def body(self, nodes):
+        for node in nodes:
+            getattr(self, "emit_" + type(node).__name__)(node)
+
+    def nested(self, nodes):
+        self.depth += 1
+        self.body(nodes)
+        self.depth -= 1
+
+    def block(self, header, nodes, close="}"):
+        self.line(header)
+        self.nested(nodes)
+        self.line(close)
+
+    def commented(self, nodes):
+        """Emit nodes as comments, for constructs the target cannot express."""
+        start = len(self.out)
+        self.body(nodes)
+        for i in range(start, len(self.out)):
+            if self.out[i]:
+                self.out[i] = self.indent * self.depth + "// " + self.out[i].lstrip()
+
+    def condition(self, text):
+        return self.translator.translate_condition(text)
+
+    def typed(self, params):
+        param_type = PARAM_TYPES.get(self.target)
+        if param_type is None:
+            return ", ".join(params)
+        return ", ".join(f"{param_type} {p}" for p in params)
+
+    # ---------------- LEAVES ----------------
+    def emit_Blank(self, node):
+        self.line("")
+
+    def emit_Comment(self, node):
+        self.line(self.translator.translate_comment(node.text))
+
+    def emit_Import(self, node):
+        self.line(self.translator.translate_import(node.text))
+
+    def emit_Statement(self, node):
+        text = self.translator.translate_line(node.text)
+        if text and not text.endswith((";", "{", "}")) and not text.startswith("//"):
+            text += ";"  # plain calls and expressions, which the line rules leave as they are
+        self.line(text)
+
+    def emit_Raw(self, node):
+        # Translated line by line, the headers of these constructs (while ... else,
+        # match, ...) would open blocks that nothing closes; keep the source instead.
+        margin = min(len(text) - len(text.lstrip()) for text in node.lines if text.strip())
+        for text in node.lines:
+            self.line("// " + text[margin:].rstrip() if text.strip() else "")
+
+    def emit_Return(self, node):
+        self.line(f"return {node.value};" if node.value else "return;")
+
+    def emit_Jump(self, node):
+        if node.keyword != "pass":
+            self.line(node.keyword + ";")
+
+    # ---------------- BLOCKS ----------------
+    def emit_FunctionDef(self, node):
+        for decorator in node.decorators:
+            self.line("// " + decorator)
+        owner = self.owners[-1] if self.owners else None
+        static = not owner or "@staticmethod" in node.decorators
+        params = node.params
+        if not static and params and params[0] in ("self", "cls"):
+            params = params[1:]
+        target = self.target
+        if owner and node.name == "__init__" and target != "c":
+            if target == "javascript":
+                header = f"constructor({', '.join(params)}) {{"
+            elif target == "c++":
+                header = f"{owner}({self.typed(params)}) {{"
+            else:
+                header = f"public {owner}({self.typed(params)}) {{"
+        elif target in ("java", "c#"):
+            header = f"public {'static ' if static else ''}Object {node.name}({self.typed(params)}) {{"
+        elif target in ("c", "c++"):
+            header = f"int {node.name}({self.typed(params)}) {{"
+        elif owner:
+            header = f"{node.name}({', '.join(params)}) {{"
+        else:
+            header = f"function {node.name}({', '.join(params)}) {{"
+        self.owners.append(None)
+        self.block(header, node.body)
+        self.owners.pop()
+
+    def emit_ClassDef(self, node):
+        for decorator in node.decorators:
+            self.line("// " + decorator)
+        bases = [b for b in node.bases if b != "object"]
+        target = self.target
+        close = "}"
+        if target == "c":
+            header = f"struct {node.name} {{"
+            close = "};"
+        elif target == "c++":
+            inherits = " : " + ", ".join(f"public {b}" for b in bases) if bases else ""
+            header = f"class {node.name}{inherits} {{"
+            close = "};"
+        elif target == "c#":
+            header = f"class {node.name} : {', '.join(bases)} {{" if bases else f"class {node.name} {{"
+        else:
+            header = f"class {node.name} extends {bases[0]} {{" if bases else f"class {node.name} {{"
+        self.owners.append(node.name)
+        self.block(header, node.body, close)
+        self.owners.pop()
+
+    def emit_If(self, node):
+        self.line(f"if ({self.condition(node.test)}) {{")
+        while True:
+            self.nested(node.body)
+            orelse = node.orelse
+            if len(orelse) == 1 and isinstance(orelse[0], pyblocks.If):
+                node = orelse[0]
+                self.line(f"}} else if ({self.condition(node.test)}) {{")
+                continue
+            if orelse:
+                self.line("} else {")
+                self.nested(orelse)
+            break
+        self.line("}")
+
+    def emit_While(self, node):
+        self.block(f"while ({self.condition(node.test)}) {{", node.body)
+
+    def emit_ForRange(self, node):
+        var = node.target
+        decl = "let" if self.target == "javascript" else "int"
+        if node.step is None:
+            compare, step = "<", f"{var}++"
+        else:
+            compare = ">" if node.step.lstrip().startswith("-") else "<"
+            step = f"{var} += {node.step}"
+        self.block(f"for ({decl} {var} = {node.start}; {var} {compare} {node.stop}; {step}) {{", node.body)
+
+    def emit_For(self, node):
+        target = node.target
+        if self.target == "javascript":
+            header = f"for (let {f'[{target}]' if ',' in target else target} of {node.iter}) {{"
+        elif self.target in ("c", "c++"):
+            header = f"for (auto {f'[{target}]' if ',' in target else target} : {node.iter}) {{"
+        else:
+            header = f"for (Object {target} : {node.iter}) {{"
+        self.block(header, node.body)
+
+    def emit_With(self, node):
+        # no context managers in the targets: keep the header and scope the body
+        self.line(f"// with {node.items}:")
+        self.block("{", node.body)
+
+    def emit_Try(self, node):
+        target = self.target
+        if target == "c" or (target == "c++" and not node.handlers):
+            # no exceptions: run the body, keep handlers as comments, finally runs unconditionally
+            if target == "c":
+                self.line("// try-catch not directly supported in C")
+            self.body(node.body)
+            for handler in node.handlers:
+                self.line(f"// except {handler.type or ''}{' as ' + handler.name if handler.name else ''}:")
+                self.commented(handler.body)
+            self.body(node.finalbody)
+            return
+        self.line("try {")
+        self.nested(node.body)
+        for handler in node.handlers:
+            name = handler.name or "e"
+            if target == "javascript":
+                self.line(f"}} catch ({name}) {{")
+            elif target == "c++":
+                if handler.type or handler.name:
+                    self.line(f"}} catch (const std::exception& {name}) {{")
+                else:
+                    self.line("} catch (...) {")
+            else:
+                exc_type = handler.type or "Exception"
+                if exc_type.startswith("("):
+                    types = [t.strip() for t in exc_type.strip("()").split(",") if t.strip()]
+                    exc_type = " | ".join(types) if target == "java" else "Exception"
+                self.line(f"}} catch ({exc_type} {name}) {{")
+            self.nested(handler.body)
+        if node.finalbody:
+            if target == "c++":
+                # C++ has no finally; the cleanup runs after the try/catch
+                self.line("}")
+                self.body(node.finalbody)
+                return
+            self.line("} finally {")
+            self.nested(node.finalbody)
+        self.line("}")
+
+
+# Target language -> emitter class; each takes a CodeTranslator and has emit(module) -> lines.
+EMITTERS = {lang: BraceEmitter for lang in ("java", "c#", "c", "c++", "javascript")}
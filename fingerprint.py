@@ -0,0 +1,152 @@
+# fingerprint.py
+# A stable hash of code and the data it reads. flaskapp.translator_fingerprint()
+# feeds it the translator so cached translations carry the version of the rules that
+# produced them: the hash changes whenever a rule, pattern or table changes, and
+# comments, docstrings, blank lines or moving code around do not change it.
+import hashlib
+import re
+import types
+
+CONSTANT_TYPES = (str, bytes, int, float, complex, bool, type(None), type(Ellipsis))
+
+
+class Fingerprint:
+    """Accumulates objects into a blake2b digest.
+
+    Functions contribute their bytecode, constants and the module globals they
+    read, so a regex or table a rule uses is covered without being listed. Classes
+    contribute their methods and class attributes, and modules their functions,
+    classes and constants. Only functions and classes defined in the modules
+    named in scope are followed; anything else is fed by name. Each object is fed once, so
+    shared helpers and cycles are fine.
+    """
+
+    def __init__(self, scope):
+        self.scope = set(scope)
+        self.digest = hashlib.blake2b(digest_size=16)
+        self.seen = set()
+
+    def hexdigest(self):
+        return self.digest.hexdigest()
+
+    def feed(self, *parts):
+        for part in parts:
+            self.digest.update(part if isinstance(part, bytes) else str(part).encode("utf-8", "surrogatepass"))
+            self.digest.update(b"\0")
+
+    def update(self, obj):
+        if isinstance(obj, CONSTANT_TYPES):
+            self.feed(type(obj).__name__, repr(obj))
+        elif isinstance(obj, re.Pattern):
+            self.feed("re", obj.pattern, obj.flags)
+        elif isinstance(obj, (tuple, list)):
+            self.feed(type(obj).__name__, len(obj))
+            for item in obj:
+                self.update(item)
+        elif isinstance(obj, dict):
+            self.feed("dict", len(obj))
+            for key, value in obj.items():  # insertion order: tables are tried in it
+                self.update(key)
+                self.update(value)
+        elif isinstance(obj, (set, frozenset)):
+            self.feed("set", len(obj))
+            for item in sorted(obj, key=repr):
+                self.update(item)
+        elif isinstance(obj, types.ModuleType):
+            self.update_module(obj)
+        elif isinstance(obj, (staticmethod, classmethod)):
+            self.update(obj.__func__)
+        elif isinstance(obj, property):
+            self.update((obj.fget, obj.fset))
+        elif isinstance(obj, type):
+            self.update_class(obj)
+        elif hasattr(obj, "__wrapped__"):  # lru_cache, functools.wraps (e.g. the rule profiler)
+            self.update(obj.__wrapped__)
+        elif isinstance(obj, types.FunctionType):
+            self.update_function(obj)
+        elif isinstance(obj, types.CodeType):
+            self.update_code(obj)
+        else:
+            self.feed("instance", type(obj).__module__, type(obj).__qualname__)
+
+    def first_visit(self, obj):
+        """Feed a reference to obj; True when its contents still need feeding."""
+        self.feed(type(obj).__name__, getattr(obj, "__module__", ""), getattr(obj, "__qualname__", obj.__name__))
+        if id(obj) in self.seen or getattr(obj, "__module__", None) not in self.scope:
+            return False
+        self.seen.add(id(obj))
+        return True
+
+    def update_function(self, func):
+        if not self.first_visit(func):
+            return
+        self.update_code(func.__code__, func.__doc__)
+        self.update(tuple(value for value in func.__defaults__ or () if isinstance(value, CONSTANT_TYPES)))
+        for cell in func.__closure__ or ():
+            self.update(cell.cell_contents)
+        for name in sorted(global_names(func.__code__)):
+            value = func.__globals__.get(name, self)
+            if value is not self and followed(name, value):
+                self.feed("global", name)
+                self.update(value)
+
+    def update_code(self, code, doc=None):
+        consts = code.co_consts
+        if doc is not None and consts and consts[0] == doc:
+            consts = consts[1:]
+        self.feed("code", code.co_code, code.co_names, code.co_varnames, code.co_freevars, code.co_argcount,
+                  code.co_kwonlyargcount, code.co_flags)
+        for const in consts:
+            self.update(const)
+
+    def update_class(self, cls):
+        if cls is object or not self.first_visit(cls):
+            return
+        self.update(tuple(base for base in cls.__bases__ if base is not object))
+        for name, value in sorted(vars(cls).items()):
+            if name not in ("__dict__", "__doc__", "__module__", "__qualname__", "__weakref__") \
+                    and not isinstance(value, types.MemberDescriptorType):
+                self.feed("attr", name)
+                self.update(value)
+
+    def update_module(self, module):
+        self.feed("module", module.__name__)
+        if module.__name__ not in self.scope or id(module) in self.seen:
+            return
+        self.seen.add(id(module))
+        for name, value in sorted(vars(module).items()):
+            if name.startswith("__") or not followed(name, value):
+                continue
+            if isinstance(value, (type, types.FunctionType)) and value.__module__ != module.__name__:
+                continue  # imported: fed where it is defined, if it is used
+            self.feed("global", name)
+            self.update(value)
+
+
+def followed(name, value):
+    """Whether a global is part of what it is read by: code, patterns and CONSTANT tables.
+
+    Lower-case data (caches, counters, the active profiler) is runtime state that
+    differs between processes, and modules are followed only through what they
+    define.
+    """
+    if isinstance(value, types.ModuleType):
+        return False
+    return name.isupper() or isinstance(value, (type, types.FunctionType, re.Pattern)) or hasattr(value, "__wrapped__")
+
+
+def global_names(code):
+    """Every name code and the functions nested in it may look up as a global."""
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            names |= global_names(const)
+    return names
+
+
+def fingerprint(objects, scope):
+    """Hex digest of objects, following functions and classes defined in the modules named in scope."""
+    fp = Fingerprint(scope)
+    for obj in objects:
+        fp.update(obj)
+    return fp.hexdigest()
@@ -1,53 +1,392 @@
 # app.py
-from flask import Flask, render_template, request, send_file
+from flask import (Flask, Response, abort, g, jsonify, make_response, render_template, request, send_file,
+                   stream_with_context)
+from collections import Counter, OrderedDict, defaultdict
+import functools
+import gc
+import hashlib
 import io
+import json
+import mmap
+import os
 import re
+import threading
+import time
+
+from compression import WIRE_LENGTH_KEY, CompressionMiddleware
+from fingerprint import fingerprint
+import lexer
+from lexer import LINE_COMMENT, LINE_IMPORT, LINE_INCLUDE, blank_literals, lex_line, literal_re
+from metrics import SIZE_BUCKETS, Registry
+from sqlitecache import SQLiteCache, TieredCache
 
 app = Flask(__name__)
+app.wsgi_app = CompressionMiddleware(app.wsgi_app)
 
 languages = ["python", "java", "c", "c++", "c#", "javascript"]
+BRACE_LANGS = ("java", "c#", "c", "c++", "javascript")
+
+# ---------------- PRECOMPILED PATTERNS ----------------
+PY_DEF_RE = re.compile(r'def\s+(\w+)\s*\((.*?)\)\s*:')
+PY_CLASS_RE = re.compile(r'class\s+(\w+)(?:\((.*?)\))?\s*:')
+PY_INIT_RE = re.compile(r'def\s+__init__\s*\(self,?\s*(.*?)\)\s*:')
+PY_EXCEPT_RE = re.compile(r'except\s*(\w+)?\s*(?:as\s+(\w+))?:')
+PY_RANGE_RE = re.compile(r'for\s+(\w+)\s+in\s+range\((\d+)\s*,?\s*(\d+)?\s*\)\s*:')
+PY_FOR_IN_RE = re.compile(r'for\s+(\w+)\s+in\s+(.+?)\s*:')
+PY_APPEND_RE = re.compile(r'(\w+)\.append\((.*?)\)')
+JAVA_METHOD_RE = re.compile(r'(public|private|protected)?\s*(static)?\s*\w+\s+\w+\s*\(')
+JAVA_METHOD_NAME_RE = re.compile(r'\w+\s+(\w+)\s*\((.*?)\)')
+JAVA_DECL_RE = re.compile(r'(int|float|double|String|boolean|char)\s+\w+')
+JAVA_CLASS_RE = re.compile(r'class\s+(\w+)')
+JAVA_IF_RE = re.compile(r'if\s*\((.*?)\)')
+JAVA_ELSE_IF_RE = re.compile(r'else if\s*\((.*?)\)')
+JAVA_FOR_RE = re.compile(r'for\s*\((int\s+)?(\w+)\s*=\s*(\d+);\s*\2\s*<\s*(\d+);\s*\2\+\+\)')
+JAVA_VAR_RE = re.compile(r'(int|float|double|String|boolean|char)\s+(\w+)\s*=\s*(.+);?')
+C_DECL_RE = re.compile(r'(int|float|double|char)\s+\w+')
+C_POINTER_RE = re.compile(r'(int|float|double|char)\s*\*')
+C_STRUCT_RE = re.compile(r'struct\s+(\w+)')
+C_VAR_RE = re.compile(r'(int|float|double|char)\s+(\w+)\s*=\s*(.+);?')
+JS_FUNCTION_RE = re.compile(r'function\s+(\w+)\s*\((.*?)\)')
+JS_ARROW_RE = re.compile(r'(const|let|var)\s+(\w+)\s*=\s*\((.*?)\)\s*=>\s*{?(.+)}?')
+JS_VAR_RE = re.compile(r'(let|const|var)\s+(\w+)\s*=\s*(.+);?')
+PAREN_RE = re.compile(r'[()]')
+PY_BLOCK_PREFIXES = ("def ", "class ", "if ", "elif ", "else", "for ", "while ")
+
+# ---------------- CONDITION OPERATORS ----------------
+PYTHON_TO_C_OPERATORS = {"and": "&&", "or": "||", "not": "!", "is not": "!=", "is": "==",
+                         "True": "true", "False": "false"}
+C_TO_PYTHON_OPERATORS = {"&&": "and", "||": "or", "!": "not", "true": "True", "false": "False"}
+# How each language spells "no object"; the first entry is what it emits.
+NULL_LITERALS = {
+    "python": ["None"],
+    "java": ["null"],
+    "c#": ["null"],
+    "c": ["NULL"],
+    "c++": ["nullptr", "NULL"],
+    "javascript": ["null", "undefined"],
+}
+JS_STRICT_OPERATORS = {"===": "==", "!==": "!="}
+
+
+def condition_operators(source_lang, target_lang):
+    """Return the {source operator: target operator} table for one translation direction."""
+    if source_lang == target_lang:
+        return {}
+    null = NULL_LITERALS[target_lang][0]
+    if source_lang == "python":
+        table = dict(PYTHON_TO_C_OPERATORS)
+        if target_lang == "javascript":
+            table.update({"is": "===", "is not": "!=="})
+    elif target_lang == "python":
+        table = dict(C_TO_PYTHON_OPERATORS)
+    else:
+        table = {}
+    for literal in NULL_LITERALS[source_lang]:
+        if literal != null:
+            table[literal] = null
+    if source_lang == "javascript":
+        for op, loose in JS_STRICT_OPERATORS.items():
+            table.setdefault(op, loose)
+    return table
+
+
+def operator_pattern(op, replacement):
+    if op[0].isalpha():
+        pattern = r"\b" + r"\s+".join(op.split()) + r"\b"
+    else:
+        pattern = re.escape(op) + ("(?!=)" if op == "!" else "")
+    if replacement == "!" or (replacement[0].isalpha() and not op[0].isalpha()):
+        pattern += r"\s*"  # "not x" -> "!x"; "a &&b" -> "a and b"
+    return pattern
+
+
+@functools.lru_cache(maxsize=None)
+def condition_rewriter(source_lang, target_lang):
+    """Compile one regex that finds every operator of a direction in a single pass.
+
+    It runs on the lexed view of a condition (LexedLine.code), where string
+    literals and comments are already blanked, so it never matches inside them.
+    Each operator is its own group, named in actions along with its replacement
+    and whether that is a keyword standing in for a symbol (and so needs spaces
+    around it). Returns (operators, actions), or None when the direction has
+    nothing to rewrite.
+    """
+    table = condition_operators(source_lang, target_lang)
+    if not table:
+        return None
+    ops = sorted(table, key=len, reverse=True)
+    alternation = "|".join(f"(?P<OP{i}>{operator_pattern(op, table[op])})" for i, op in enumerate(ops))
+    actions = {f"OP{i}": (table[op], table[op][0].isalpha() and not op[0].isalpha()) for i, op in enumerate(ops)}
+    # as in lexer.literal_re, a lookahead on the first characters skips most positions
+    first = "".join(sorted({op[0] for op in ops}))
+    return re.compile(f"(?=[{re.escape(first)}])(?:{alternation})"), actions
+
+# ---------------- CACHES ----------------
+class LRUCache:
+    """Bounded, thread-safe least-recently-used mapping with hit/miss counters."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self.lock:
+            try:
+                value = self.data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self.data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self.lock:
+            self.data[key] = value
+            self.data.move_to_end(key)
+            if len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+
+    def __contains__(self, key):
+        with self.lock:
+            return key in self.data
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self.lock:
+            return {"size": len(self.data), "maxsize": self.maxsize,
+                    "hits": self.hits, "misses": self.misses}
+
+
+# Set TRANSLATION_CACHE_DB to a file path to also keep line and document translations
+# in SQLite, shared by every worker and kept across restarts (sqlitecache.py).
+TRANSLATION_CACHE_DB = os.environ.get("TRANSLATION_CACHE_DB")
+TRANSLATION_CACHE_MAX_MB = int(os.environ.get("TRANSLATION_CACHE_MAX_MB", 512))
+translation_store = None
+if TRANSLATION_CACHE_DB:
+    translation_store = SQLiteCache(TRANSLATION_CACHE_DB, lambda: translator_fingerprint(),
+                                    TRANSLATION_CACHE_MAX_MB * 1024 * 1024)
+
+# Translations of single (stripped) lines, keyed by (source_lang, target_lang, line)
+# and shared by every request.
+LINE_CACHE_SIZE = int(os.environ.get("LINE_CACHE_SIZE", 10000))
+line_cache = LRUCache(LINE_CACHE_SIZE)
+if translation_store is not None:
+    line_cache = TieredCache(line_cache, translation_store, "line")
+
+
+class DocumentCache:
+    """LRU of whole translated documents, optionally backed by a directory on disk
+    and/or the shared SQLiteCache store.
+
+    Downloads read the same entries: from the file on disk when there is one,
+    otherwise as UTF-8 bytes encoded once and kept in a smaller LRU of their own.
+    """
+
+    def __init__(self, maxsize, directory=None, encoded_size=32, store=None):
+        self.memory = LRUCache(maxsize)
+        self.encoded = LRUCache(encoded_size)
+        self.directory = directory
+        self.store = store
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.directory, key + ".txt")
+
+    def get(self, key):
+        result = self.memory.get(key)
+        if result is None and self.directory:
+            try:
+                with open(self.path(key), encoding="utf-8", newline="") as f:
+                    result = f.read()
+            except FileNotFoundError:
+                result = None
+        if result is None and self.store is not None:
+            result = self.store.get("document", key)
+        if result is not None:
+            self.memory.put(key, result)
+        return result
+
+    def put(self, key, value):
+        self.memory.put(key, value)
+        if self.store is not None:
+            self.store.put("document", key, value)
+            self.store.flush()  # visible to the other workers right away
+        if self.directory:
+            tmp_path = f"{self.path(key)}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+                f.write(value)
+            os.replace(tmp_path, self.path(key))
+
+    def __contains__(self, key):
+        """Whether key can be served without translating it again."""
+        if key in self.memory or self.file(key):
+            return True
+        return self.store is not None and self.store.get("document", key) is not None
+
+    def file(self, key):
+        """Path of the on-disk copy of key, or None."""
+        if self.directory and os.path.exists(self.path(key)):
+            return self.path(key)
+        return None
+
+    def get_bytes(self, key):
+        """The translation under key as UTF-8 bytes, or None when it is not cached."""
+        data = self.encoded.get(key)
+        if data is None:
+            text = self.get(key)
+            if text is None:
+                return None
+            data = text.encode()
+            self.encoded.put(key, data)
+        return data
+
+
+def document_key(code, source_lang, target_lang):
+    """Content hash of a translation request and the translator version, used as cache key and ETag."""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{translator_fingerprint()}\0{source_lang.lower()}\0{target_lang.lower()}\0".encode())
+    if uses_ast_frontend(source_lang, target_lang):
+        digest.update(b"ast\0")
+    digest.update(code.encode("utf-8", "surrogatepass"))
+    return digest.hexdigest()
+
+
+# Translations of whole documents, keyed by document_key(); set DOCUMENT_CACHE_DIR
+# to also keep them on disk.
+DOCUMENT_CACHE_DIR = os.environ.get("DOCUMENT_CACHE_DIR")
+DOCUMENT_CACHE_SIZE = int(os.environ.get("DOCUMENT_CACHE_SIZE", 256))
+# Encoded copies kept for /download/<key>, when there is no on-disk copy to stream.
+DOWNLOAD_CACHE_SIZE = int(os.environ.get("DOWNLOAD_CACHE_SIZE", 32))
+document_cache = DocumentCache(DOCUMENT_CACHE_SIZE, DOCUMENT_CACHE_DIR, DOWNLOAD_CACHE_SIZE, translation_store)
+# A /download/<key> link only works if whichever worker gets it still has the key:
+# always in a single process, and with several (WEB_CONCURRENCY, as gunicorn reads
+# it) only with a store they share. Otherwise the page posts the translation back.
+DOWNLOAD_LINKS = bool(DOCUMENT_CACHE_DIR or TRANSLATION_CACHE_DB) or int(os.environ.get("WEB_CONCURRENCY", 1)) <= 1
+DOCUMENT_KEY_RE = re.compile(r"[0-9a-f]{32}")
+
+# Characters per chunk written by the streaming endpoint.
+STREAM_CHUNK_SIZE = 64 * 1024
+# "ast" parses whole Python modules (frontends.FRONTENDS) and writes their block
+# structure through emitters.EMITTERS, closing every block; statements inside still
+# go through the line rules. The default "lines" mode translates each line on its own.
+PYTHON_FRONTEND = os.environ.get("PYTHON_FRONTEND", "lines").lower()
+# Directory /stream may read ?path= sources from; unset disables local-path mode.
+LOCAL_PATH_ROOT = os.environ.get("LOCAL_PATH_ROOT")
+
+
+def stateful(rule):
+    """Mark a rule whose output depends on translator state; its results are never cached."""
+    rule.stateful = True
+    return rule
+
 
 # ---------------- ADVANCED FEATURE MAPPINGS ----------------
-class CodeTranslator:
+class RuleSet:
+    """The compiled, read-only part of a translation for one language pair.
+
+    Built once per pair by rule_set_for() and shared by every CodeTranslator (and
+    so every thread) translating that pair; nothing here changes after __init__.
+    """
+
+    __slots__ = ("source_lang", "target_lang", "python_rules", "source_handler")
+
     def __init__(self, source_lang, target_lang):
-        self.source_lang = source_lang.lower()
-        self.target_lang = target_lang.lower()
+        self.source_lang = source_lang
+        self.target_lang = target_lang
+        self.python_rules = python_rules_for(target_lang) if source_lang == "python" else None
+        self.source_handler = SOURCE_HANDLERS.get(source_lang)
+
+
+# Source language -> CodeTranslator method name; bound per translator, so methods
+# swapped in by enable_profiling() take effect for translators created afterwards.
+SOURCE_HANDLERS = {
+    "python": "from_python",
+    "java": "from_java",
+    "c#": "from_csharp",
+    "c": "from_c_cpp",
+    "c++": "from_c_cpp",
+    "javascript": "from_javascript",
+}
+# (source_lang, target_lang) -> RuleSet, filled by rule_set_for() on first use of a pair.
+rule_sets = {}
+
+
+def rule_set_for(source_lang, target_lang):
+    key = (source_lang, target_lang)
+    rules = rule_sets.get(key)
+    if rules is None:
+        rules = rule_sets[key] = RuleSet(source_lang, target_lang)
+    return rules
+
+
+class CodeTranslator:
+    """Translation state for one document over the shared RuleSet of its pair.
+
+    Creating one is a dict lookup and a few attribute stores, so use one per
+    document (and so per thread) rather than sharing it; the compiled rules are
+    shared through self.rules.
+    """
+
+    __slots__ = ("rules", "source_lang", "target_lang", "cache", "cacheable", "indent_level", "in_function",
+                 "in_class", "python_rules", "source_handler")
+
+    def __init__(self, source_lang, target_lang, cache=None):
+        self.rules = rules = rule_set_for(source_lang.lower(), target_lang.lower())
+        self.source_lang = rules.source_lang
+        self.target_lang = rules.target_lang
+        self.python_rules = rules.python_rules
+        self.source_handler = rules.source_handler and getattr(self, rules.source_handler)
+        self.cache = cache
+        self.cacheable = True
         self.indent_level = 0
         self.in_function = False
         self.in_class = False
-        
+
     def translate_line(self, line):
         stripped = line.strip()
         if not stripped:
             return ""
+        if self.cache is None:
+            return self.translate_stripped(stripped)
+
+        key = (self.source_lang, self.target_lang, stripped)
+        result = self.cache.get(key)
+        if result is None:
+            self.cacheable = True
+            result = self.translate_stripped(stripped)
+            if self.cacheable:
+                self.cache.put(key, result)
+        elif profiler is not None:
+            profiler.cache_hit(self.source_lang, self.target_lang)
+        return result
+
+    def translate_stripped(self, stripped):
+        lexed = lex_line(stripped, self.source_lang)
+        kind = lexed.kind
 
         # ---------------- COMMENTS ----------------
-        if self.translate_comment(stripped):
+        if kind == LINE_COMMENT:
             return self.translate_comment(stripped)
 
-        # ---------------- IMPORTS ----------------
-        if self.translate_import(stripped):
+        # ---------------- IMPORTS / INCLUDES ----------------
+        if kind == LINE_IMPORT or kind == LINE_INCLUDE:
             return self.translate_import(stripped)
 
-        # ---------------- PYTHON AS SOURCE ----------------
-        if self.source_lang == "python":
-            return self.from_python(stripped)
-
-        # ---------------- JAVA AS SOURCE ----------------
-        if self.source_lang == "java":
-            return self.from_java(stripped)
-
-        # ---------------- C# AS SOURCE ----------------
-        if self.source_lang == "c#":
-            return self.from_csharp(stripped)
-
-        # ---------------- C / C++ AS SOURCE ----------------
-        if self.source_lang in ["c", "c++"]:
-            return self.from_c_cpp(stripped)
-
-        # ---------------- JAVASCRIPT AS SOURCE ----------------
-        if self.source_lang == "javascript":
-            return self.from_javascript(stripped)
+        # ---------------- SOURCE LANGUAGE HANDLER ----------------
+        if self.source_handler:
+            return self.source_handler(stripped, lexed)
 
         return stripped
 
@@ -97,10 +436,30 @@ class CodeTranslator:
         return None
 
     # ---------------- FROM PYTHON ----------------
-    def from_python(self, line):
-        # PRINT with formatting
+    def from_python(self, line, lexed=None):
+        if lexed is None:
+            lexed = lex_line(line, self.source_lang)
+        by_head, generic = self.python_rules
+        return self.run_rules(by_head.get(lexed.head, generic), line, lexed.code)
+
+    def run_rules(self, rules, line, code):
+        """Return the result of the first rule that matches line, or line itself when none does."""
+        for rule in rules:
+            result = rule(self, line, code)
+            if result is not None:
+                if getattr(rule, "stateful", False):
+                    self.cacheable = False
+                return result
+        return line
+
+    # Each python_* rule returns the translated line, or None to fall through
+    # to the next candidate rule (same order as PYTHON_RULES below). `code` is the
+    # line with string literals and comments blanked out, for substring checks.
+
+    # PRINT with formatting
+    def python_print(self, line, code):
         if line.startswith("print("):
-            content = self.extract_parentheses(line, "print")
+            content = self.extract_parentheses(line, "print", code)
             if self.target_lang in ["java", "c#"]:
                 return f"System.out.println({content});"
             if self.target_lang in ["c", "c++"]:
@@ -110,13 +469,14 @@ class CodeTranslator:
             if self.target_lang == "javascript":
                 return f"console.log({content});"
 
-        # FUNCTION DEFINITION with return type and parameters
-        if line.startswith("def ") and ":" in line:
-            match = re.match(r'def\s+(\w+)\s*\((.*?)\)\s*:', line)
+    # FUNCTION DEFINITION with return type and parameters
+    def python_def(self, line, code):
+        if line.startswith("def ") and ":" in code:
+            match = PY_DEF_RE.match(line)
             if match:
                 name, params = match.groups()
                 param_list = [p.strip() for p in params.split(",") if p.strip()]
-                
+
                 if self.target_lang in ["java", "c#"]:
                     typed_params = ", ".join([f"Object {p}" for p in param_list]) if param_list else ""
                     return f"public static Object {name}({typed_params}) {{"
@@ -126,20 +486,23 @@ class CodeTranslator:
                 if self.target_lang == "javascript":
                     return f"function {name}({', '.join(param_list)}) {{"
 
-        # RETURN statement
+    # RETURN statement
+    def python_return(self, line, code):
         if line.startswith("return "):
             value = line[7:].strip()
-            if self.target_lang in ["java", "c#", "c", "c++", "javascript"]:
+            if self.target_lang in BRACE_LANGS:
                 return f"return {value};"
             return line
 
-        # VARIABLE ASSIGNMENTS (including typed)
-        if "=" in line and not any(line.startswith(x) for x in ["def ", "class ", "if ", "elif ", "else", "for ", "while "]):
+    # VARIABLE ASSIGNMENTS (including typed)
+    def python_assignment(self, line, code):
+        if "=" in code and not line.startswith(PY_BLOCK_PREFIXES):
             return self.translate_assignment(line)
 
-        # CLASS DEFINITION
-        if line.startswith("class ") and ":" in line:
-            match = re.match(r'class\s+(\w+)(?:\((.*?)\))?\s*:', line)
+    # CLASS DEFINITION
+    def python_class(self, line, code):
+        if line.startswith("class ") and ":" in code:
+            match = PY_CLASS_RE.match(line)
             if match:
                 name, parent = match.groups()
                 if self.target_lang in ["java", "c#", "c++", "javascript"]:
@@ -147,9 +510,11 @@ class CodeTranslator:
                         return f"class {name} extends {parent} {{"
                     return f"class {name} {{"
 
-        # CONSTRUCTOR (__init__)
+    # CONSTRUCTOR (__init__) - reads self.in_class
+    @stateful
+    def python_init(self, line, code):
         if line.startswith("def __init__"):
-            match = re.match(r'def\s+__init__\s*\(self,?\s*(.*?)\)\s*:', line)
+            match = PY_INIT_RE.match(line)
             if match:
                 params = match.group(1)
                 if self.target_lang == "java":
@@ -161,43 +526,47 @@ class CodeTranslator:
                 if self.target_lang == "javascript":
                     return f"constructor({params}) {{"
 
-        # IF / ELIF / ELSE
-        if line.startswith("if ") and ":" in line:
-            cond = line[3:line.rfind(":")].strip()
-            cond = self.translate_condition(cond)
-            if self.target_lang in ["java", "c#", "c", "c++", "javascript"]:
+    # IF / ELIF / ELSE
+    def python_if(self, line, code):
+        if line.startswith("if ") and ":" in code:
+            cond = self.condition_in(line, code, 3, code.rfind(":"))
+            if self.target_lang in BRACE_LANGS:
                 return f"if ({cond}) {{"
-            
-        if line.startswith("elif ") and ":" in line:
-            cond = line[5:line.rfind(":")].strip()
-            cond = self.translate_condition(cond)
-            if self.target_lang in ["java", "c#", "c", "c++", "javascript"]:
+
+    def python_elif(self, line, code):
+        if line.startswith("elif ") and ":" in code:
+            cond = self.condition_in(line, code, 5, code.rfind(":"))
+            if self.target_lang in BRACE_LANGS:
                 return f"}} else if ({cond}) {{"
-            
+
+    def python_else(self, line, code):
         if line.startswith("else:"):
-            if self.target_lang in ["java", "c#", "c", "c++", "javascript"]:
+            if self.target_lang in BRACE_LANGS:
                 return "} else {"
 
-        # FOR LOOP (including range, enumerate)
-        if line.startswith("for ") and ":" in line:
+    # FOR LOOP (including range, enumerate)
+    def python_for(self, line, code):
+        if line.startswith("for ") and ":" in code:
             return self.translate_for_loop(line)
 
-        # WHILE LOOP
-        if line.startswith("while ") and ":" in line:
-            cond = line[6:line.rfind(":")].strip()
-            cond = self.translate_condition(cond)
-            if self.target_lang in ["java", "c#", "c", "c++", "javascript"]:
+    # WHILE LOOP
+    def python_while(self, line, code):
+        if line.startswith("while ") and ":" in code:
+            cond = self.condition_in(line, code, 6, code.rfind(":"))
+            if self.target_lang in BRACE_LANGS:
                 return f"while ({cond}) {{"
 
-        # TRY/EXCEPT/FINALLY
+    # TRY/EXCEPT/FINALLY
+    def python_try(self, line, code):
         if line.startswith("try:"):
             if self.target_lang in ["java", "c#", "javascript"]:
                 return "try {"
             if self.target_lang in ["c", "c++"]:
                 return "// try-catch not directly supported in C"
-                
+
+    def python_except(self, line, code):
         if line.startswith("except"):
-            match = re.match(r'except\s*(\w+)?\s*(?:as\s+(\w+))?:', line)
+            match = PY_EXCEPT_RE.match(line)
             if match and self.target_lang in ["java", "c#"]:
                 exc_type = match.group(1) or "Exception"
                 exc_var = match.group(2) or "e"
@@ -205,41 +574,60 @@ class CodeTranslator:
             if self.target_lang == "javascript":
                 exc_var = match.group(2) if match else "e"
                 return f"}} catch ({exc_var}) {{"
-                
+
+    def python_finally(self, line, code):
         if line.startswith("finally:"):
             if self.target_lang in ["java", "c#", "javascript"]:
                 return "} finally {"
 
-        # LIST/ARRAY OPERATIONS
-        if ".append(" in line:
+    # LIST/ARRAY OPERATIONS
+    def python_append(self, line, code):
+        if ".append(" in code:
             return self.translate_append(line)
-        
-        if ".extend(" in line or ".remove(" in line or ".pop(" in line:
+
+    def python_list_operation(self, line, code):
+        if ".extend(" in code or ".remove(" in code or ".pop(" in code:
             return self.translate_list_operation(line)
 
-        # DICTIONARY OPERATIONS
-        if line.startswith("{") and ":" in line and "}" in line:
+    # DICTIONARY OPERATIONS
+    def python_dict(self, line, code):
+        if line.startswith("{") and ":" in code and "}" in code:
             return self.translate_dict(line)
 
-        # STRING OPERATIONS
-        if ".split(" in line or ".join(" in line or ".replace(" in line:
+    # STRING OPERATIONS
+    def python_string_operation(self, line, code):
+        if ".split(" in code or ".join(" in code or ".replace(" in code:
             return self.translate_string_operation(line)
 
-        # LAMBDA FUNCTIONS
-        if "lambda" in line:
+    # LAMBDA FUNCTIONS
+    def python_lambda(self, line, code):
+        if "lambda" in code:
             return self.translate_lambda(line)
 
-        # LIST COMPREHENSION
-        if "[" in line and "for" in line and "]" in line:
+    # LIST COMPREHENSION
+    def python_list_comprehension(self, line, code):
+        if "[" in code and "for" in code and "]" in code:
             return self.translate_list_comprehension(line)
 
-        return line
-
     # ---------------- FROM JAVA ----------------
-    def from_java(self, line):
-        # Print statements
-        if "System.out.println" in line or "System.out.print" in line:
-            content = self.extract_parentheses(line, "System.out.print")
+    # Like the python_* rules: each returns the translated line or None to fall
+    # through; the tables below (JAVA_RULES, ...) give the order.
+    def from_java(self, line, lexed=None):
+        if lexed is None:
+            lexed = lex_line(line, self.source_lang)
+        return self.run_rules(JAVA_RULES, line, lexed.code)
+
+    # Closing braces: nothing below can match a lone brace
+    def java_closing_brace(self, line, code):
+        if line == "}" or line == "};":
+            if self.target_lang == "python":
+                return ""
+            return line
+
+    # Print statements
+    def java_print(self, line, code):
+        if "System.out.print" in code:
+            content = self.extract_parentheses(line, "System.out.print", code)
             if self.target_lang == "python":
                 return f"print({content})"
             if self.target_lang in ["c", "c++"]:
@@ -247,46 +635,47 @@ class CodeTranslator:
             if self.target_lang == "javascript":
                 return f"console.log({content});"
 
-        # Function/Method definition
-        if re.match(r'(public|private|protected)?\s*(static)?\s*\w+\s+\w+\s*\(', line):
-            if self.target_lang == "python":
-                match = re.search(r'\w+\s+(\w+)\s*\((.*?)\)', line)
-                if match:
-                    name, params = match.groups()
-                    param_list = [p.split()[-1] for p in params.split(",") if p.strip()]
-                    return f"def {name}({', '.join(param_list)}):"
-
-        # Variable declarations
-        if re.match(r'(int|float|double|String|boolean|char)\s+\w+', line):
+    # Function/Method definition
+    def java_method(self, line, code):
+        if self.target_lang == "python" and JAVA_METHOD_RE.match(line):
+            match = JAVA_METHOD_NAME_RE.search(line)
+            if match:
+                name, params = match.groups()
+                param_list = [p.split()[-1] for p in params.split(",") if p.strip()]
+                return f"def {name}({', '.join(param_list)}):"
+
+    # Variable declarations
+    def java_declaration(self, line, code):
+        if JAVA_DECL_RE.match(line):
             return self.translate_java_variable(line)
 
-        # Class definition
+    # Class definition
+    def java_class(self, line, code):
         if line.startswith("class ") or line.startswith("public class "):
-            match = re.search(r'class\s+(\w+)', line)
+            match = JAVA_CLASS_RE.search(line)
             if match and self.target_lang == "python":
                 return f"class {match.group(1)}:"
 
-        # Control structures
+    # Control structures
+    def java_control(self, line, code):
         if line.startswith("if ") or line.startswith("} else if ") or line.startswith("else {"):
-            return self.from_java_control(line)
+            return self.from_java_control(line, code)
 
-        # For loop
+    # For loop
+    def java_for(self, line, code):
         if line.startswith("for "):
             return self.from_java_for_loop(line)
 
-        # Closing braces
-        if line == "}" or line == "};":
-            if self.target_lang == "python":
-                return ""
-            return line
-
-        return line
-
     # ---------------- FROM C# ----------------
-    def from_csharp(self, line):
-        # Similar to Java with Console instead of System.out
-        if "Console.WriteLine" in line or "Console.Write" in line:
-            content = self.extract_parentheses(line, "Console.Write")
+    def from_csharp(self, line, lexed=None):
+        if lexed is None:
+            lexed = lex_line(line, self.source_lang)
+        return self.run_rules(CSHARP_RULES, line, lexed.code)
+
+    # Similar to Java with Console instead of System.out; the rest are the Java rules
+    def csharp_print(self, line, code):
+        if "Console.Write" in code:
+            content = self.extract_parentheses(line, "Console.Write", code)
             if self.target_lang == "python":
                 return f"print({content})"
             if self.target_lang == "java":
@@ -295,15 +684,17 @@ class CodeTranslator:
                 return f'printf({content});'
             if self.target_lang == "javascript":
                 return f"console.log({content});"
-        
-        # Rest similar to Java
-        return self.from_java(line)
 
     # ---------------- FROM C/C++ ----------------
-    def from_c_cpp(self, line):
-        # Printf statements
-        if "printf" in line:
-            content = self.extract_parentheses(line, "printf")
+    def from_c_cpp(self, line, lexed=None):
+        if lexed is None:
+            lexed = lex_line(line, self.source_lang)
+        return self.run_rules(C_RULES, line, lexed.code)
+
+    # Printf statements
+    def c_printf(self, line, code):
+        if "printf" in code:
+            content = self.extract_parentheses(line, "printf", code)
             if self.target_lang == "python":
                 # Simple conversion, may need refinement
                 content = content.replace('"%d"', '').replace('"%s"', '').replace('\\n', '')
@@ -313,33 +704,38 @@ class CodeTranslator:
             if self.target_lang == "javascript":
                 return f"console.log({content});"
 
-        # Scanf statements
-        if "scanf" in line:
-            if self.target_lang == "python":
-                return "# input() - translate manually"
+    # Scanf statements
+    def c_scanf(self, line, code):
+        if "scanf" in code and self.target_lang == "python":
+            return "# input() - translate manually"
 
-        # Variable declarations
-        if re.match(r'(int|float|double|char)\s+\w+', line):
+    # Variable declarations
+    def c_declaration(self, line, code):
+        if C_DECL_RE.match(line):
             return self.translate_c_variable(line)
 
-        # Pointers
-        if "*" in line and re.match(r'(int|float|double|char)\s*\*', line):
-            if self.target_lang == "python":
-                return "# pointer - use object reference"
+    # Pointers
+    def c_pointer(self, line, code):
+        if "*" in code and self.target_lang == "python" and C_POINTER_RE.match(line):
+            return "# pointer - use object reference"
 
-        # Struct
+    # Struct
+    def c_struct(self, line, code):
         if line.startswith("struct "):
-            match = re.search(r'struct\s+(\w+)', line)
+            match = C_STRUCT_RE.search(line)
             if match and self.target_lang == "python":
                 return f"class {match.group(1)}:"
 
-        return line
-
     # ---------------- FROM JAVASCRIPT ----------------
-    def from_javascript(self, line):
-        # Console.log
-        if "console.log" in line:
-            content = self.extract_parentheses(line, "console.log")
+    def from_javascript(self, line, lexed=None):
+        if lexed is None:
+            lexed = lex_line(line, self.source_lang)
+        return self.run_rules(JAVASCRIPT_RULES, line, lexed.code)
+
+    # Console.log
+    def javascript_print(self, line, code):
+        if "console.log" in code:
+            content = self.extract_parentheses(line, "console.log", code)
             if self.target_lang == "python":
                 return f"print({content})"
             if self.target_lang == "java":
@@ -347,9 +743,10 @@ class CodeTranslator:
             if self.target_lang in ["c", "c++"]:
                 return f'printf({content});'
 
-        # Function definitions
+    # Function definitions
+    def javascript_function(self, line, code):
         if line.startswith("function "):
-            match = re.match(r'function\s+(\w+)\s*\((.*?)\)', line)
+            match = JS_FUNCTION_RE.match(line)
             if match:
                 name, params = match.groups()
                 if self.target_lang == "python":
@@ -357,48 +754,81 @@ class CodeTranslator:
                 if self.target_lang in ["java", "c#"]:
                     return f"public static void {name}({params}) {{"
 
-        # Arrow functions
-        if "=>" in line:
+    # Arrow functions
+    def javascript_arrow(self, line, code):
+        if "=>" in code:
             return self.translate_arrow_function(line)
 
-        # Variable declarations
+    # Variable declarations
+    def javascript_declaration(self, line, code):
         if line.startswith("let ") or line.startswith("const ") or line.startswith("var "):
             return self.translate_js_variable(line)
 
-        # Array methods
-        if ".push(" in line or ".pop(" in line or ".shift(" in line:
+    # Array methods
+    def javascript_array_method(self, line, code):
+        if ".push(" in code or ".pop(" in code or ".shift(" in code:
             return self.translate_js_array_method(line)
 
-        return line
-
     # ---------------- HELPER FUNCTIONS ----------------
-    def extract_parentheses(self, line, prefix):
-        start = line.find(prefix) + len(prefix)
-        paren_start = line.find("(", start)
+    def extract_parentheses(self, line, prefix, code=None):
+        # Scan the literal-free view so parentheses inside strings are not counted
+        if code is None:
+            code = lex_line(line, self.source_lang).code
+        start = code.find(prefix) + len(prefix)
+        paren_start = code.find("(", start)
         if paren_start == -1:
             return ""
         depth = 1
-        i = paren_start + 1
-        while i < len(line) and depth > 0:
-            if line[i] == "(":
-                depth += 1
-            elif line[i] == ")":
-                depth -= 1
-            i += 1
-        return line[paren_start+1:i-1]
-
-    def translate_condition(self, cond):
-        # Python to other languages
-        if self.source_lang == "python":
-            cond = cond.replace(" and ", " && ").replace(" or ", " || ").replace(" not ", " !")
-            cond = cond.replace("True", "true").replace("False", "false")
-            cond = cond.replace("None", "null")
-        # Other languages to Python
-        elif self.target_lang == "python":
-            cond = cond.replace(" && ", " and ").replace(" || ", " or ").replace("!", " not ")
-            cond = cond.replace("true", "True").replace("false", "False")
-            cond = cond.replace("null", "None")
-        return cond
+        for paren in PAREN_RE.finditer(code, paren_start + 1):
+            depth += 1 if paren.group() == "(" else -1
+            if depth == 0:
+                return line[paren_start+1:paren.start()]
+        return line[paren_start+1:-1]
+
+    def condition_in(self, line, code, start, end):
+        """translate_condition() of line[start:end] less its surrounding whitespace; code is the line's lexed view."""
+        text = line[start:end]
+        stripped = text.lstrip()
+        start += len(text) - len(stripped)
+        end = start + len(stripped.rstrip())
+        return self.translate_condition(line[start:end], code[start:end])
+
+    def translate_condition(self, cond, code=None):
+        """Rewrite the operators of cond, leaving its string literals and comments as they are.
+
+        code is cond with those blanked out (its slice of LexedLine.code); cond is
+        lexed here when it is not given. Operators are found in code and replaced
+        in cond, which only differ inside literals.
+        """
+        rewriter = condition_rewriter(self.source_lang, self.target_lang)
+        if rewriter is None:
+            return cond
+        operators, actions = rewriter
+        if code is None:
+            code = blank_literals(cond, self.source_lang)
+        padded_to = 0  # end of the last keyword that already added its trailing space
+
+        def replace(match):
+            nonlocal padded_to
+            replacement, spaced = actions[match.lastgroup]
+            if not spaced:
+                return replacement
+            # symbolic operator -> keyword: make sure it stays a separate word
+            start = match.start()
+            padded = start == padded_to or cond[start - 1] in " \t("
+            padded_to = match.end()
+            return ("" if padded else " ") + replacement + " "
+
+        if code == cond:
+            return operators.sub(replace, cond).rstrip()
+        parts = []
+        last = 0
+        for match in operators.finditer(code):
+            parts.append(cond[last:match.start()])
+            parts.append(replace(match))
+            last = match.end()
+        parts.append(cond[last:])
+        return "".join(parts).rstrip()
 
     def translate_assignment(self, line):
         if "," in line.split("=")[0]:  # Multiple assignment
@@ -426,7 +856,7 @@ class CodeTranslator:
 
     def translate_for_loop(self, line):
         # Python for loop
-        match = re.match(r'for\s+(\w+)\s+in\s+range\((\d+)\s*,?\s*(\d+)?\s*\)\s*:', line)
+        match = PY_RANGE_RE.match(line)
         if match:
             var, start, end = match.groups()
             if not end:
@@ -438,7 +868,7 @@ class CodeTranslator:
                 return f"for (let {var} = {start}; {var} < {end}; {var}++) {{"
         
         # for item in list
-        match = re.match(r'for\s+(\w+)\s+in\s+(.+?)\s*:', line)
+        match = PY_FOR_IN_RE.match(line)
         if match:
             var, collection = match.groups()
             if self.target_lang in ["java", "c#"]:
@@ -451,7 +881,7 @@ class CodeTranslator:
         return line
 
     def translate_append(self, line):
-        match = re.match(r'(\w+)\.append\((.*?)\)', line)
+        match = PY_APPEND_RE.match(line)
         if match:
             var, item = match.groups()
             if self.target_lang in ["java", "c#"]:
@@ -483,7 +913,7 @@ class CodeTranslator:
         return f"// {line}  # List comprehension"
 
     def translate_arrow_function(self, line):
-        match = re.match(r'(const|let|var)\s+(\w+)\s*=\s*\((.*?)\)\s*=>\s*{?(.+)}?', line)
+        match = JS_ARROW_RE.match(line)
         if match and self.target_lang == "python":
             _, name, params, body = match.groups()
             return f"def {name}({params}):\n    return {body.strip()}"
@@ -491,7 +921,7 @@ class CodeTranslator:
 
     def translate_java_variable(self, line):
         if self.target_lang == "python":
-            match = re.match(r'(int|float|double|String|boolean|char)\s+(\w+)\s*=\s*(.+);?', line)
+            match = JAVA_VAR_RE.match(line)
             if match:
                 _, var, value = match.groups()
                 return f"{var} = {value}"
@@ -499,7 +929,7 @@ class CodeTranslator:
 
     def translate_c_variable(self, line):
         if self.target_lang == "python":
-            match = re.match(r'(int|float|double|char)\s+(\w+)\s*=\s*(.+);?', line)
+            match = C_VAR_RE.match(line)
             if match:
                 _, var, value = match.groups()
                 return f"{var} = {value}"
@@ -507,7 +937,7 @@ class CodeTranslator:
 
     def translate_js_variable(self, line):
         if self.target_lang == "python":
-            match = re.match(r'(let|const|var)\s+(\w+)\s*=\s*(.+);?', line)
+            match = JS_VAR_RE.match(line)
             if match:
                 _, var, value = match.groups()
                 return f"{var} = {value}"
@@ -518,83 +948,709 @@ class CodeTranslator:
             return line.replace(".push(", ".append(").rstrip(";")
         return line
 
-    def from_java_control(self, line):
+    def from_java_control(self, line, code):
         if self.target_lang == "python":
             if line.startswith("if "):
-                cond = re.search(r'if\s*\((.*?)\)', line)
+                cond = JAVA_IF_RE.search(line)
                 if cond:
-                    return f"if {self.translate_condition(cond.group(1))}:"
+                    return f"if {self.translate_condition(cond.group(1), code[cond.start(1):cond.end(1)])}:"
             if "else if" in line:
-                cond = re.search(r'else if\s*\((.*?)\)', line)
+                cond = JAVA_ELSE_IF_RE.search(line)
                 if cond:
-                    return f"elif {self.translate_condition(cond.group(1))}:"
+                    return f"elif {self.translate_condition(cond.group(1), code[cond.start(1):cond.end(1)])}:"
             if line.startswith("else"):
                 return "else:"
         return line
 
     def from_java_for_loop(self, line):
         if self.target_lang == "python":
-            match = re.search(r'for\s*\((int\s+)?(\w+)\s*=\s*(\d+);\s*\2\s*<\s*(\d+);\s*\2\+\+\)', line)
+            match = JAVA_FOR_RE.search(line)
             if match:
                 var, start, end = match.group(2), match.group(3), match.group(4)
                 return f"for {var} in range({start}, {end}):"
         return line
 
 
-def translate_code(code, source_lang, target_lang):
-    translator = CodeTranslator(source_lang, target_lang)
-    lines = code.splitlines()
-    translated_lines = []
-    indent = 0
-    
+# ---------------- PYTHON RULE TABLE ----------------
+# (rule, leading tokens it can fire on or None for any line, targets it emits for or None for all).
+# Order matters: candidates are tried in table order and the first non-None result wins.
+PYTHON_RULES = [
+    (CodeTranslator.python_print, ["print"], BRACE_LANGS),
+    (CodeTranslator.python_def, ["def"], BRACE_LANGS),
+    (CodeTranslator.python_return, ["return"], None),
+    (CodeTranslator.python_assignment, None, None),
+    (CodeTranslator.python_class, ["class"], ["java", "c#", "c++", "javascript"]),
+    (CodeTranslator.python_init, ["def"], ["java", "c#", "c++", "javascript"]),
+    (CodeTranslator.python_if, ["if"], BRACE_LANGS),
+    (CodeTranslator.python_elif, ["elif"], BRACE_LANGS),
+    (CodeTranslator.python_else, ["else"], BRACE_LANGS),
+    (CodeTranslator.python_for, ["for"], None),
+    (CodeTranslator.python_while, ["while"], BRACE_LANGS),
+    (CodeTranslator.python_try, ["try"], BRACE_LANGS),
+    # "except" is a plain prefix match, so it also fires on e.g. "exceptional(...)"
+    (CodeTranslator.python_except, None, ["java", "c#", "javascript"]),
+    (CodeTranslator.python_finally, ["finally"], ["java", "c#", "javascript"]),
+    (CodeTranslator.python_append, None, None),
+    (CodeTranslator.python_list_operation, None, None),
+    (CodeTranslator.python_dict, ["{"], None),
+    (CodeTranslator.python_string_operation, None, None),
+    (CodeTranslator.python_lambda, None, None),
+    (CodeTranslator.python_list_comprehension, None, None),
+]
+
+
+def build_python_rules(target_lang):
+    """Return (rules by leading token, rules for any other token) for one target."""
+    rules = [(rule, heads) for rule, heads, targets in PYTHON_RULES
+             if targets is None or target_lang in targets]
+    generic = [rule for rule, heads in rules if heads is None]
+    by_head = {}
+    for _, heads in rules:
+        for head in heads or []:
+            by_head[head] = [rule for rule, rule_heads in rules
+                             if rule_heads is None or head in rule_heads]
+    return by_head, generic
+
+
+# Built on first use of each target by python_rules_for(); warm_up() fills it ahead of a fork.
+python_rule_tables = {}
+
+
+def python_rules_for(target_lang):
+    table = python_rule_tables.get(target_lang)
+    if table is None:
+        table = python_rule_tables[target_lang] = build_python_rules(target_lang)
+    return table
+
+
+# ---------------- SOURCE RULE TABLES ----------------
+# The rules of the other source languages, tried in order on every line: there
+# are few enough that no per-token dispatch is needed. A line no rule matches is
+# kept as it is.
+JAVA_RULES = [
+    CodeTranslator.java_closing_brace,
+    CodeTranslator.java_print,
+    CodeTranslator.java_method,
+    CodeTranslator.java_declaration,
+    CodeTranslator.java_class,
+    CodeTranslator.java_control,
+    CodeTranslator.java_for,
+]
+CSHARP_RULES = [CodeTranslator.csharp_print] + JAVA_RULES
+C_RULES = [
+    CodeTranslator.c_printf,
+    CodeTranslator.c_scanf,
+    CodeTranslator.c_declaration,
+    CodeTranslator.c_pointer,
+    CodeTranslator.c_struct,
+]
+JAVASCRIPT_RULES = [
+    CodeTranslator.javascript_print,
+    CodeTranslator.javascript_function,
+    CodeTranslator.javascript_arrow,
+    CodeTranslator.javascript_declaration,
+    CodeTranslator.javascript_array_method,
+]
+# Source language -> its rule table (C++ shares the C rules through from_c_cpp).
+SOURCE_RULES = {"java": JAVA_RULES, "c#": CSHARP_RULES, "c": C_RULES, "javascript": JAVASCRIPT_RULES}
+
+
+# ---------------- TRANSLATOR FINGERPRINT ----------------
+@functools.lru_cache(maxsize=1)
+def translator_fingerprint():
+    """Hash of the rules, patterns and emitter tables that decide a translation.
+
+    Computed from the code objects and data themselves (fingerprint.py), so it
+    changes exactly when a translation could; it is part of every document key and
+    sent as the X-Translator-Version header. Includes PYTHON_FRONTEND.
+    """
+    import emitters
+    import frontends
+    import pyblocks
+    roots = (translate_code, translate_stream, CodeTranslator, RuleSet, PYTHON_RULES, SOURCE_RULES,
+             SOURCE_HANDLERS, lexer, pyblocks, frontends, emitters)
+    return fingerprint(roots, scope=(__name__, "lexer", "pyblocks", "frontends", "emitters"))
+
+
+# ---------------- PROFILING ----------------
+class RuleProfiler:
+    """Counts rule attempts/matches and time spent per CodeTranslator method.
+
+    Covers the rule tables of every source language. Lines no rule matched are
+    counted per source language, and lines answered from the line cache or the
+    per-call memo of translate_lines() (which run no rule) per language pair.
+
+    Only installed by enable_profiling(); when disabled the translator runs its
+    original, unwrapped methods and rule tables, and the cache paths test one
+    global.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.attempts = Counter()
+        self.matches = Counter()
+        self.unmatched = Counter()
+        self.cache_hits = Counter()
+        self.calls = Counter()
+        self.seconds = defaultdict(float)
+        self.original_methods = {}
+        self.original_rules = {}
+
+    def wrap_rule(self, rule):
+        name = rule.__name__
+
+        @functools.wraps(rule)
+        def wrapper(translator, line, code):
+            start = time.perf_counter()
+            result = rule(translator, line, code)
+            elapsed = time.perf_counter() - start
+            with self.lock:
+                self.attempts[name] += 1
+                if result is not None:
+                    self.matches[name] += 1
+                self.seconds[name] += elapsed
+            return result
+        return wrapper
+
+    def wrap_dispatch(self, run_rules):
+        @functools.wraps(run_rules)
+        def wrapper(translator, rules, line, code):
+            for rule in rules:
+                result = rule(translator, line, code)
+                if result is not None:
+                    if getattr(rule, "stateful", False):
+                        translator.cacheable = False
+                    return result
+            with self.lock:
+                self.unmatched[translator.source_lang] += 1
+            return line
+        return wrapper
+
+    def cache_hit(self, source_lang, target_lang):
+        with self.lock:
+            self.cache_hits[f"{source_lang}->{target_lang}"] += 1
+
+    def wrap_method(self, method):
+        name = method.__name__
+
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                with self.lock:
+                    self.calls[name] += 1
+                    self.seconds[name] += elapsed
+        return wrapper
+
+    def snapshot(self):
+        with self.lock:
+            rules = {name: {"attempts": self.attempts[name], "matches": self.matches[name],
+                            "seconds": self.seconds[name]} for name in self.attempts}
+            methods = {name: {"calls": self.calls[name], "seconds": self.seconds[name]}
+                       for name in self.calls}
+            unmatched, cache_hits = dict(self.unmatched), dict(self.cache_hits)
+        return {"enabled": True, "rules": rules, "methods": methods, "unmatched": unmatched,
+                "cache_hits": cache_hits}
+
+    def reset(self):
+        with self.lock:
+            self.attempts.clear()
+            self.matches.clear()
+            self.unmatched.clear()
+            self.cache_hits.clear()
+            self.calls.clear()
+            self.seconds.clear()
+
+
+# The active RuleProfiler, or None while profiling is disabled.
+profiler = None
+
+
+def enable_profiling():
+    """Instrument the from_* / translate_* methods, run_rules() and the rule tables.
+
+    Affects CodeTranslator instances created from now on.
+    """
+    global profiler
+    if profiler is not None:
+        return profiler
+    profiler = RuleProfiler()
+    for name, method in list(vars(CodeTranslator).items()):
+        if name.startswith(("from_", "translate_")) and callable(method):
+            profiler.original_methods[name] = method
+            setattr(CodeTranslator, name, profiler.wrap_method(method))
+    profiler.original_methods["run_rules"] = CodeTranslator.run_rules
+    CodeTranslator.run_rules = profiler.wrap_dispatch(CodeTranslator.run_rules)
+    profiler.original_rules["python"] = list(PYTHON_RULES)
+    PYTHON_RULES[:] = [(profiler.wrap_rule(rule), heads, targets) for rule, heads, targets in PYTHON_RULES]
+    for lang, rules in SOURCE_RULES.items():
+        profiler.original_rules[lang] = list(rules)
+        rules[:] = [profiler.wrap_rule(rule) for rule in rules]
+    python_rule_tables.clear()
+    rule_sets.clear()
+    return profiler
+
+
+def disable_profiling():
+    """Restore the uninstrumented methods and rule tables."""
+    global profiler
+    if profiler is None:
+        return
+    for name, method in profiler.original_methods.items():
+        setattr(CodeTranslator, name, method)
+    PYTHON_RULES[:] = profiler.original_rules.pop("python")
+    for lang, rules in profiler.original_rules.items():
+        SOURCE_RULES[lang][:] = rules
+    python_rule_tables.clear()
+    rule_sets.clear()
+    profiler = None
+
+
+def profile_snapshot():
+    """Rule and method counters as a dict ({"enabled": False} when profiling is off)."""
+    if profiler is None:
+        return {"enabled": False}
+    return profiler.snapshot()
+
+
+if os.environ.get("TRANSLATOR_PROFILE"):
+    enable_profiling()
+
+
+# Distinct lines remembered by one translate_lines() call before it starts over.
+LINE_MEMO_SIZE = 4096
+MISSING = object()
+
+
+def translate_lines(lines, source_lang, target_lang, cache=line_cache, translator=None):
+    """Translate lines independently of each other; blank source lines map to None.
+
+    This is the line-local part of a translation. apply_indent() adds the only
+    state carried between lines, so consecutive slices of a file can be
+    translated separately and re-joined. Pass translator to reuse an existing
+    CodeTranslator for the same pair.
+
+    Each distinct stripped line is translated once per call and its result
+    reused, so blank lines, lone braces and other repeats never reach the
+    translator or the shared cache. Results of stateful rules are not reused.
+    """
+    if translator is None:
+        translator = CodeTranslator(source_lang, target_lang, cache)
+    memo = {"": None}
     for line in lines:
-        if not line.strip():
-            translated_lines.append("")
-            continue
-            
-        t_line = translator.translate_line(line)
-        
-        # Handle indentation for brace-based languages
-        if target_lang.lower() in ["java", "c#", "c", "c++", "javascript"]:
-            if t_line.rstrip().endswith("{"):
-                translated_lines.append("    " * indent + t_line)
-                indent += 1
-            elif t_line.strip() == "}" or t_line.strip().startswith("}"):
-                indent -= 1
-                translated_lines.append("    " * indent + t_line)
-            else:
-                translated_lines.append("    " * indent + t_line)
-        else:
-            # Python-style indentation
-            translated_lines.append(t_line)
-    
-    return "\n".join(translated_lines)
+        stripped = line.strip()
+        result = memo.get(stripped, MISSING)
+        if result is MISSING:
+            translator.cacheable = True
+            result = translator.translate_line(stripped)
+            if translator.cacheable:
+                if len(memo) >= LINE_MEMO_SIZE:
+                    memo.clear()
+                    memo[""] = None
+                memo[stripped] = result
+        elif profiler is not None and stripped:
+            profiler.cache_hit(translator.source_lang, translator.target_lang)
+        yield result
+
+
+def indent_line(t_line, indent):
+    """One step of apply_indent() for a brace target: (output line, indent for the next line)."""
+    if t_line is None:
+        return "", indent
+    if t_line.rstrip().endswith("{"):
+        return "    " * indent + t_line, indent + 1
+    if t_line.strip().startswith("}"):
+        indent -= 1
+    return "    " * indent + t_line, indent
+
+
+def apply_indent(t_lines, target_lang, indent=0):
+    """Indent the output of translate_lines() for brace-based targets, starting at indent."""
+    if target_lang.lower() not in BRACE_LANGS:
+        # Python-style indentation
+        for t_line in t_lines:
+            yield "" if t_line is None else t_line
+        return
+    for t_line in t_lines:
+        line, indent = indent_line(t_line, indent)
+        yield line
+
+
+def translate_stream(lines, source_lang, target_lang, cache=line_cache, translator=None):
+    """Translate an iterable of source lines, yielding translated lines one at a time.
+
+    Only the brace indent counter is carried between lines, so memory stays flat
+    however long the input is.
+    """
+    return apply_indent(translate_lines(lines, source_lang, target_lang, cache, translator), target_lang)
+
+
+def mapped_lines(f):
+    """Return an iterator over the lines of a binary file, read lazily through a memory map.
+
+    The map is made here rather than on first iteration, and keeps its own handle,
+    so f may be closed before the lines are consumed (as uploads are when a
+    streamed response outlives the request). Only the current line is held in
+    Python memory, so inputs far larger than RAM translate in flat memory. File
+    objects without a descriptor (small uploads kept in memory) are read as is.
+    Lines are split as str.splitlines() splits them, like pasted code.
+    """
+    try:
+        fileno = f.fileno()
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        return iter(f.read().decode("utf-8", "replace").splitlines())
+    if not os.fstat(fileno).st_size:
+        return iter(())
+    return iter_mapped(mmap.mmap(fileno, 0, access=mmap.ACCESS_READ))
+
+
+def iter_mapped(mapped):
+    with mapped:
+        size = len(mapped)
+        start = 0
+        while start < size:
+            end = mapped.find(b"\n", start) + 1 or size
+            # the chunk keeps its "\n", so splitlines() cuts it as it would the whole text
+            yield from mapped[start:end].decode("utf-8", "replace").splitlines()
+            start = end
+
+
+def file_lines(path):
+    """mapped_lines() of the file at path."""
+    with open(path, "rb") as f:
+        return mapped_lines(f)
+
+
+def uses_ast_frontend(source_lang, target_lang):
+    if PYTHON_FRONTEND != "ast":
+        return False  # checked first so line-mode workers never import ast and tokenize
+    from emitters import EMITTERS
+    from frontends import FRONTENDS
+    return source_lang.lower() in FRONTENDS and target_lang.lower() in EMITTERS
+
+
+def translate_module(code, source_lang, target_lang, cache=line_cache, translator=None):
+    """Lower a whole Python module to pyblocks and emit it; raises SyntaxError if it does not parse."""
+    from emitters import EMITTERS
+    from frontends import FRONTENDS
+    source_lang, target_lang = source_lang.lower(), target_lang.lower()
+    module = FRONTENDS[source_lang](code).lower()
+    if translator is None:
+        translator = CodeTranslator(source_lang, target_lang, cache)
+    return "\n".join(EMITTERS[target_lang](translator).emit(module))
+
+
+def translate_code(code, source_lang, target_lang, cache=line_cache, translator=None):
+    if uses_ast_frontend(source_lang, target_lang):
+        try:
+            return translate_module(code, source_lang, target_lang, cache, translator)
+        except (SyntaxError, ValueError):
+            pass  # e.g. a pasted fragment that is not a complete module: translate line by line
+    return "\n".join(translate_stream(code.splitlines(), source_lang, target_lang, cache, translator))
+
+
+def join_chunks(lines, chunk_size=STREAM_CHUNK_SIZE):
+    """Re-join streamed lines with newlines into chunks of roughly chunk_size characters."""
+    buffer = []
+    size = 0
+    first = True
+    for line in lines:
+        if not first:
+            buffer.append("\n")
+        first = False
+        buffer.append(line)
+        size += len(line) + 1
+        if size >= chunk_size:
+            yield "".join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield "".join(buffer)
+
+
+# ---------------- WARM-UP ----------------
+# Small inputs that reach the literal scan, the condition rewriter and the block rules.
+WARM_UP_SAMPLES = {
+    "python": 'import os\ndef f(a):\n    if a and not b:\n        print("x")\n    return a',
+    "javascript": "const os = require('os');\nfunction f(a) {\n    if (a && !b) {\n        console.log(`x`);\n    }\n}",
+}
+C_FAMILY_SAMPLE = '#include <os>\nint f(int a) {\n    if (a && !b) {\n        printf("x");\n    }\n    return a;\n}'
+
+
+def warm_up(pairs=None):
+    """Build the rule tables and compiled patterns of pairs (default: all) now rather than on first use.
+
+    Call it in the master of a pre-forking server, e.g. gunicorn --preload with
+    WARM_UP=all, so workers inherit the compiled tables and share them
+    copy-on-write. gc.freeze() then keeps the collector from writing to, and so
+    copying, those pages in every worker.
+    """
+    if pairs is None:
+        pairs = [(source_lang, target_lang) for source_lang in languages for target_lang in languages]
+    for source_lang, target_lang in pairs:
+        literal_re(source_lang)
+        translate_code(WARM_UP_SAMPLES.get(source_lang, C_FAMILY_SAMPLE), source_lang, target_lang, cache=None)
+    translator_fingerprint()
+    gc.freeze()
+
+
+def parse_pairs(spec):
+    """"all" or a comma-separated list of source:target pairs, e.g. "python:java,java:python"."""
+    if spec.strip().lower() == "all":
+        return None
+    return [tuple(pair.strip().lower().split(":", 1)) for pair in spec.split(",") if pair.strip()]
+
+
+if os.environ.get("WARM_UP"):
+    warm_up(parse_pairs(os.environ["WARM_UP"]))
+
+
+# ---------------- REQUEST METRICS ----------------
+registry = Registry()
+registry.describe("codeconvertor_requests_total", "counter", "Requests served, by route, language pair and status.")
+registry.describe("codeconvertor_request_seconds", "histogram", "Total time spent handling a request.")
+registry.describe("codeconvertor_translation_seconds", "histogram", "Time spent translating, excluding the rest of the request.")
+registry.describe("codeconvertor_request_bytes", "histogram", "Size of the request body.")
+registry.gauge("codeconvertor_cache_hits_total", "Cache lookups that found an entry.", lambda: {
+    (("cache", "line"),): line_cache.hits,
+    (("cache", "document"),): document_cache.memory.hits,
+    **({(("cache", "sqlite"),): translation_store.hits} if translation_store else {}),
+}, kind="counter")
+registry.gauge("codeconvertor_cache_misses_total", "Cache lookups that found nothing.", lambda: {
+    (("cache", "line"),): line_cache.misses,
+    (("cache", "document"),): document_cache.memory.misses,
+    **({(("cache", "sqlite"),): translation_store.misses} if translation_store else {}),
+}, kind="counter")
+registry.gauge("codeconvertor_cache_entries", "Entries currently held in memory.", lambda: {
+    (("cache", "line"),): len(line_cache.data),
+    (("cache", "document"),): len(document_cache.memory.data),
+})
+registry.gauge("codeconvertor_translator_info", "Always 1; labelled with the translator fingerprint.", lambda: {
+    (("fingerprint", translator_fingerprint()),): 1,
+})
+registry.gauge("codeconvertor_rule_attempts_total", "Rule attempts (only while profiling is enabled).", lambda: {
+    (("rule", name),): counts["attempts"] for name, counts in profile_snapshot().get("rules", {}).items()
+}, kind="counter")
+registry.gauge("codeconvertor_rule_matches_total", "Rule matches (only while profiling is enabled).", lambda: {
+    (("rule", name),): counts["matches"] for name, counts in profile_snapshot().get("rules", {}).items()
+}, kind="counter")
+registry.gauge("codeconvertor_rule_unmatched_total", "Lines no rule matched (only while profiling is enabled).",
+               lambda: {(("source", lang),): n for lang, n in profile_snapshot().get("unmatched", {}).items()},
+               kind="counter")
+registry.gauge("codeconvertor_rule_cache_hits_total",
+               "Lines answered without running rules (only while profiling is enabled).",
+               lambda: {(("pair", pair),): n for pair, n in profile_snapshot().get("cache_hits", {}).items()},
+               kind="counter")
+
+INSTRUMENTED_ENDPOINTS = {"index", "download", "api_translate"}
+
+
+def language_label(lang):
+    """Known language names as-is; anything else collapses to one label value."""
+    lang = (lang or "").lower()
+    return lang if lang in languages or not lang else "other"
+
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+
+@app.after_request
+def record_request_metrics(response):
+    if request.endpoint in INSTRUMENTED_ENDPOINTS and "request_start" in g:
+        labels = (("route", request.endpoint),
+                  ("source", language_label(g.get("source_lang"))),
+                  ("target", language_label(g.get("target_lang"))))
+        registry.inc("codeconvertor_requests_total", labels + (("status", response.status_code),))
+        registry.observe("codeconvertor_request_seconds", labels, time.perf_counter() - g.request_start)
+        # a decoded body has no Content-Length left; the middleware kept the one sent
+        size = request.environ.get(WIRE_LENGTH_KEY, request.content_length) or 0
+        registry.observe("codeconvertor_request_bytes", labels[:1], size, SIZE_BUCKETS)
+    return response
+
+
+@app.after_request
+def add_translator_version(response):
+    response.headers["X-Translator-Version"] = translator_fingerprint()
+    return response
+
+
+def not_modified(etag):
+    response = make_response("", 304)
+    response.set_etag(etag)
+    return response
 
 
 @app.route("/", methods=["GET", "POST"])
 def index():
     translated_code = ""
+    etag = None
     if request.method == "POST":
         source_lang = request.form.get("source_lang")
         target_lang = request.form.get("target_lang")
         code = request.form.get("code")
-        translated_code = translate_code(code, source_lang, target_lang)
-    return render_template("index.html", translated_code=translated_code, languages=languages)
-
-
+        g.source_lang, g.target_lang = source_lang, target_lang
+        etag = document_key(code, source_lang, target_lang)
+        if request.if_none_match.contains(etag):
+            return not_modified(etag)
+        translated_code = document_cache.get(etag)
+        if translated_code is None:
+            start = time.perf_counter()
+            translated_code = translate_code(code, source_lang, target_lang)
+            registry.observe("codeconvertor_translation_seconds",
+                             (("source", language_label(source_lang)), ("target", language_label(target_lang))),
+                             time.perf_counter() - start)
+            document_cache.put(etag, translated_code)
+    download_key = etag if DOWNLOAD_LINKS and etag in document_cache else None
+    response = make_response(render_template("index.html", translated_code=translated_code, languages=languages,
+                                             download_key=download_key))
+    if etag:
+        response.set_etag(etag)
+    return response
+
+
+@app.route("/download/<key>")
 @app.route("/download", methods=["POST"])
-def download():
-    code = request.form.get("translated_code")
-    buffer = io.StringIO()
-    buffer.write(code)
-    buffer.seek(0)
+def download(key=None):
+    """Send a translation as a file attachment.
+
+    GET /download/<key> serves a cached result by its document key (the index
+    page's ETag), so the client never re-uploads it; the page links to it when
+    DOWNLOAD_LINKS and the key is cached. Otherwise it POSTs translated_code back.
+    """
+    if key is None:
+        code = request.form.get("translated_code")
+        if code is None:
+            abort(400, "translated_code is required")
+        etag = hashlib.blake2b(code.encode("utf-8", "surrogatepass"), digest_size=16).hexdigest()
+        path, data = None, code.encode()
+    else:
+        if not DOCUMENT_KEY_RE.fullmatch(key):
+            abort(404)
+        etag = key
+        path = document_cache.file(key)
+        data = None if path else document_cache.get_bytes(key)
+        if path is None and data is None:
+            abort(404, "translation is no longer cached; translate it again")
+    if request.if_none_match.contains(etag):
+        return not_modified(etag)
     return send_file(
-        io.BytesIO(buffer.read().encode()),
+        path or io.BytesIO(data),
         as_attachment=True,
         download_name="translated_code.txt",
-        mimetype="text/plain"
+        mimetype="text/plain",
+        etag=etag
     )
 
 
+def local_source(path):
+    """Resolve a ?path= under LOCAL_PATH_ROOT, refusing anything outside it."""
+    if not LOCAL_PATH_ROOT:
+        abort(403, "local-path mode is disabled; set LOCAL_PATH_ROOT")
+    root = os.path.realpath(LOCAL_PATH_ROOT)
+    resolved = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, resolved]) != root:
+        abort(403, "path is outside LOCAL_PATH_ROOT")
+    if not os.path.isfile(resolved):
+        abort(404)
+    return resolved
+
+
+@app.route("/stream", methods=["POST"])
+def stream():
+    """Translate source code as a chunked text/plain response.
+
+    The source is, in order of precedence: an uploaded file field, a ?path= under
+    LOCAL_PATH_ROOT, the form's code field, or the raw request body. Files are
+    read through a memory map one line at a time; an uploaded file's translation
+    is sent as an attachment, as /download sends it.
+    """
+    source_lang = request.args.get("source_lang") or request.form.get("source_lang")
+    target_lang = request.args.get("target_lang") or request.form.get("target_lang")
+    if not source_lang or not target_lang:
+        abort(400, "source_lang and target_lang are required")
+    headers = {}
+    upload = request.files.get("file")
+    if upload is not None and upload.filename:
+        lines = mapped_lines(upload.stream)
+        headers["Content-Disposition"] = "attachment; filename=translated_code.txt"
+    elif request.args.get("path"):
+        lines = file_lines(local_source(request.args["path"]))
+    elif request.form.get("code") is not None:
+        lines = request.form["code"].splitlines()
+    else:
+        body = io.TextIOWrapper(request.stream, encoding="utf-8", errors="replace", newline="")
+        lines = (line for chunk in body for line in chunk.splitlines())
+    translated = translate_stream(lines, source_lang, target_lang)
+    return Response(stream_with_context(join_chunks(translated)), mimetype="text/plain", headers=headers)
+
+
+# Most jobs accepted in one /api/translate request.
+API_MAX_JOBS = int(os.environ.get("API_MAX_JOBS", 1000))
+
+
+def translate_job(job, translators):
+    """Translate one /api/translate job, reusing translators (per pair) across the batch."""
+    if not isinstance(job, dict):
+        return {"error": "job must be an object"}
+    code = job.get("code")
+    source_lang = str(job.get("source_lang", "")).lower()
+    target_lang = str(job.get("target_lang", "")).lower()
+    if not isinstance(code, str):
+        return {"error": "code must be a string"}
+    if source_lang not in languages or target_lang not in languages:
+        return {"error": f"unsupported language pair {source_lang!r} -> {target_lang!r}"}
+
+    key = document_key(code, source_lang, target_lang)
+    translated = document_cache.get(key)
+    if translated is None:
+        translator = translators.get((source_lang, target_lang))
+        if translator is None:
+            translator = translators[(source_lang, target_lang)] = CodeTranslator(source_lang, target_lang, line_cache)
+        start = time.perf_counter()
+        translated = translate_code(code, source_lang, target_lang, translator=translator)
+        registry.observe("codeconvertor_translation_seconds", (("source", source_lang), ("target", target_lang)),
+                         time.perf_counter() - start)
+        document_cache.put(key, translated)
+    return translated
+
+
+@app.route("/api/translate", methods=["POST"])
+def api_translate():
+    """Translate a JSON array of {code, source_lang, target_lang} jobs in one round trip.
+
+    Returns an array in job order: the translated code, or {"error": ...} for a bad job.
+    """
+    jobs = request.get_json(silent=True)
+    if isinstance(jobs, dict):
+        jobs = jobs.get("jobs")
+    if not isinstance(jobs, list):
+        abort(400, "expected a JSON array of jobs")
+    if len(jobs) > API_MAX_JOBS:
+        abort(413, f"at most {API_MAX_JOBS} jobs per request")
+
+    translators = {}
+    results = [translate_job(job, translators) for job in jobs]
+    return Response(json.dumps(results, separators=(",", ":")), mimetype="application/json")
+
+
+@app.route("/api/version")
+def api_version():
+    """The translator fingerprint (see translator_fingerprint()) and the languages it handles."""
+    return jsonify({"fingerprint": translator_fingerprint(), "frontend": PYTHON_FRONTEND, "languages": languages})
+
+
+@app.route("/metrics")
+def metrics():
+    """Prometheus text exposition; clients asking for JSON get the rule profile instead."""
+    if request.accept_mimetypes.best_match(["text/plain", "application/json"]) == "application/json":
+        return jsonify(profile_snapshot())
+    return Response(registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 if __name__ == "__main__":
     app.run(debug=True)
@@ -0,0 +1,183 @@
+# frontends.py
+import ast
+import io
+import tokenize
+
+import pyblocks
+
+
+def split_lines(code):
+    """Split on the same line endings the Python tokenizer uses, so ast line numbers index the result."""
+    return code.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+
+
+def own_line_comments(code, lines):
+    """Return (line number, text) for every comment that sits alone on its line."""
+    comments = []
+    try:
+        for tok in tokenize.generate_tokens(io.StringIO(code).readline):
+            if tok.type == tokenize.COMMENT and lines[tok.start[0] - 1].lstrip().startswith("#"):
+                comments.append((tok.start[0], tok.string))
+    except (tokenize.TokenError, SyntaxError):
+        pass  # ast.parse already accepted the module; missing comments are not fatal
+    return comments
+
+
+class PythonFrontend:
+    """Parse a whole Python module once with ast and lower it to pyblocks nodes.
+
+    Statements spanning several physical lines come out as one logical line, and
+    blocks are nested by the parser rather than guessed from each line, so the
+    emitter can close them. Raises SyntaxError when the source is not a module.
+    """
+
+    def __init__(self, code):
+        self.code = code
+        self.lines = split_lines(code)
+        self.tree = ast.parse(code)
+        self.blank = {i for i, line in enumerate(self.lines, 1) if not line.strip()}
+        self.comments = own_line_comments(code, self.lines)
+        self.next_comment = 0
+
+    def lower(self):
+        body = self.block(self.tree.body)
+        self.flush_comments(body, len(self.lines) + 1)
+        return pyblocks.Module(body)
+
+    # ---------------- HELPERS ----------------
+    def text(self, node):
+        """Source of a node on one line; nodes spanning several lines are re-rendered."""
+        if node.lineno != node.end_lineno:
+            return ast.unparse(node)
+        line = self.lines[node.lineno - 1]
+        if line.isascii():
+            return line[node.col_offset:node.end_col_offset]
+        # ast offsets count UTF-8 bytes
+        return line.encode("utf-8")[node.col_offset:node.end_col_offset].decode("utf-8")
+
+    def add(self, body, lineno, nodes):
+        if body and lineno - 1 in self.blank:
+            body.append(pyblocks.BLANK)
+        body.extend(nodes)
+
+    def flush_comments(self, body, before):
+        """Move comments that start before line `before` into body."""
+        comments = self.comments
+        while self.next_comment < len(comments) and comments[self.next_comment][0] < before:
+            lineno, text = comments[self.next_comment]
+            self.next_comment += 1
+            self.add(body, lineno, [pyblocks.Comment(text)])
+
+    def skip_comments(self, through):
+        while self.next_comment < len(self.comments) and self.comments[self.next_comment][0] <= through:
+            self.next_comment += 1
+
+    def block(self, stmts):
+        body = []
+        for node in stmts:
+            decorators = getattr(node, "decorator_list", None)
+            start = decorators[0].lineno if decorators else node.lineno
+            self.flush_comments(body, start)
+            self.add(body, start, self.statement(node))
+        return body
+
+    def raw(self, node):
+        start = node.decorator_list[0].lineno if getattr(node, "decorator_list", None) else node.lineno
+        self.skip_comments(node.end_lineno)
+        return [pyblocks.Raw(self.lines[start - 1:node.end_lineno])]
+
+    # ---------------- STATEMENTS ----------------
+    def statement(self, node):
+        """Lower one ast statement to a list of pyblocks nodes."""
+        lower = getattr(self, "lower_" + type(node).__name__, None)
+        if lower is not None:
+            return lower(node)
+        if hasattr(node, "body") or hasattr(node, "cases"):
+            return self.raw(node)  # match, async for, loops and try with else, ...
+        return [pyblocks.Statement(self.text(node))]
+
+    def params(self, args):
+        names = [a.arg for a in args.posonlyargs + args.args]
+        if args.vararg:
+            names.append(args.vararg.arg)
+        names.extend(a.arg for a in args.kwonlyargs)
+        if args.kwarg:
+            names.append(args.kwarg.arg)
+        return names
+
+    def decorators(self, node):
+        return ["@" + self.text(d) for d in node.decorator_list]
+
+    def lower_FunctionDef(self, node):
+        return [pyblocks.FunctionDef(node.name, self.params(node.args), self.block(node.body), self.decorators(node))]
+
+    lower_AsyncFunctionDef = lower_FunctionDef
+
+    def lower_ClassDef(self, node):
+        bases = [self.text(b) for b in node.bases]
+        return [pyblocks.ClassDef(node.name, bases, self.block(node.body), self.decorators(node))]
+
+    def lower_If(self, node):
+        return [pyblocks.If(self.text(node.test), self.block(node.body), self.block(node.orelse))]
+
+    def lower_While(self, node):
+        if node.orelse:
+            return self.raw(node)
+        return [pyblocks.While(self.text(node.test), self.block(node.body))]
+
+    def lower_For(self, node):
+        if node.orelse:
+            return self.raw(node)
+        it = node.iter
+        if (isinstance(node.target, ast.Name) and isinstance(it, ast.Call) and isinstance(it.func, ast.Name)
+                and it.func.id == "range" and 1 <= len(it.args) <= 3 and not it.keywords
+                and not any(isinstance(a, ast.Starred) for a in it.args)):
+            bounds = [self.text(a) for a in it.args]
+            if len(bounds) == 1:
+                bounds.insert(0, "0")
+            start, stop = bounds[:2]
+            step = bounds[2] if len(bounds) == 3 else None
+            return [pyblocks.ForRange(node.target.id, start, stop, step, self.block(node.body))]
+        return [pyblocks.For(self.text(node.target), self.text(it), self.block(node.body))]
+
+    def lower_With(self, node):
+        items = [self.text(item.context_expr) + (" as " + self.text(item.optional_vars) if item.optional_vars else "")
+                 for item in node.items]
+        return [pyblocks.With(", ".join(items), self.block(node.body))]
+
+    def lower_Try(self, node):
+        if node.orelse:
+            return self.raw(node)
+        handlers = [pyblocks.Handler(self.text(h.type) if h.type else None, h.name, self.block(h.body))
+                    for h in node.handlers]
+        return [pyblocks.Try(self.block(node.body), handlers, self.block(node.finalbody))]
+
+    def lower_Return(self, node):
+        return [pyblocks.Return(self.text(node.value) if node.value else None)]
+
+    def lower_Pass(self, node):
+        return [pyblocks.Jump("pass")]
+
+    def lower_Break(self, node):
+        return [pyblocks.Jump("break")]
+
+    def lower_Continue(self, node):
+        return [pyblocks.Jump("continue")]
+
+    def lower_Import(self, node):
+        return [pyblocks.Import(self.text(node))]
+
+    lower_ImportFrom = lower_Import
+
+    def lower_Expr(self, node):
+        value = node.value
+        if isinstance(value, ast.Constant) and isinstance(value.value, str):
+            # docstrings become comments
+            return [pyblocks.Comment("# " + line.strip()) for line in value.value.strip().splitlines() if line.strip()]
+        return [pyblocks.Statement(self.text(node))]
+
+
+# Source language -> frontend class; each takes the source text and has lower() -> pyblocks.Module.
+# Only Python has one: pyblocks keeps statement text in the source language, and the
+# emitters read it as Python.
+FRONTENDS = {"python": PythonFrontend}
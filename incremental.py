@@ -0,0 +1,228 @@
+# incremental.py
+from flaskapp import (BRACE_LANGS, CodeTranslator, indent_line, line_cache, translate_code, translate_lines,
+                      uses_ast_frontend)
+
+
+def line_diff(old_code, new_code):
+    """Return the single edit (start, end, lines) that turns old_code into new_code.
+
+    Lines old[start:end] are replaced by the list lines, which may hold blank
+    lines; found by trimming the common leading and trailing lines, for callers
+    that only have both versions.
+    """
+    old, new = old_code.splitlines(), new_code.splitlines()
+    start = 0
+    limit = min(len(old), len(new))
+    while start < limit and old[start] == new[start]:
+        start += 1
+    end_old, end_new = len(old), len(new)
+    while end_old > start and end_new > start and old[end_old - 1] == new[end_new - 1]:
+        end_old -= 1
+        end_new -= 1
+    return start, end_old, new[start:end_new]
+
+
+class IncrementalTranslation:
+    """A translated document that can be edited without re-translating all of it.
+
+    Line-based translation is line-local except for the brace indent counter, so
+    an edit re-translates only its own lines. Lines after it are re-indented only
+    when the edit changes the brace balance, and keep their translations. Sources
+    parsed as a whole module (PYTHON_FRONTEND=ast) are re-translated on every edit.
+
+    output holds the output of each source line; a line that a rule translated to
+    several lines spans them, joined by "\n", and extra maps it to the number of
+    output lines it adds. translated and indents are known for a prefix of the
+    lines only: a document rebuilt by from_translation() reads them back off its
+    output on demand, up to the lines an edit touches.
+    """
+
+    def __init__(self, code, source_lang, target_lang, cache=line_cache):
+        self.source_lang = source_lang.lower()
+        self.target_lang = target_lang.lower()
+        self.translator = CodeTranslator(self.source_lang, self.target_lang, cache)
+        self.brace = self.target_lang in BRACE_LANGS
+        self.whole_module = uses_ast_frontend(self.source_lang, self.target_lang)
+        self.lines = []
+        self.translated = []  # translate_lines() output, None for blank source lines
+        self.indents = []  # brace indent counter before each line
+        self.output = []
+        self.extra = {}  # line index -> output lines it spans beyond its first
+        if self.whole_module:
+            self.lines = code.splitlines()
+            self.output = translate_code(code, self.source_lang, self.target_lang, translator=self.translator).split("\n")
+        else:
+            self.splice(0, 0, code.splitlines(), 0)
+
+    @classmethod
+    def from_translation(cls, code, translation, source_lang, target_lang, cache=line_cache):
+        """Rebuild the state from a document and its translate_code() output without re-translating.
+
+        When translation has more lines than code, the lines that produced several
+        are found by translating from the top until the rest of both line up one to
+        one. Falls back to translating code when translation does not line up with it.
+        """
+        self = cls.__new__(cls)
+        self.source_lang = source_lang.lower()
+        self.target_lang = target_lang.lower()
+        self.translator = CodeTranslator(self.source_lang, self.target_lang, cache)
+        self.brace = self.target_lang in BRACE_LANGS
+        self.whole_module = uses_ast_frontend(self.source_lang, self.target_lang)
+        self.lines = code.splitlines()
+        self.output = translation.split("\n") if self.lines else []
+        self.translated = []
+        self.indents = []
+        self.extra = {}
+        if self.whole_module:
+            return self
+        if len(self.output) != len(self.lines) and not self.find_spans():
+            self.retranslate()
+        return self
+
+    def find_spans(self):
+        """Group self.output into one entry per source line; False when the two do not line up."""
+        lines, physical = self.lines, self.output
+        if len(physical) < len(lines):
+            return False
+        output, j = [], 0
+        translated = translate_lines(lines, self.source_lang, self.target_lang, translator=self.translator)
+        for i, t_line in enumerate(translated):
+            if len(physical) - j == len(lines) - i:
+                output.extend(physical[j:])  # one output line per source line from here on
+                break
+            span = t_line.count("\n") + 1 if t_line else 1
+            if span > 1:
+                self.extra[i] = span - 1
+            output.append("\n".join(physical[j:j + span]))
+            j += span
+        if len(output) != len(lines) or sum(entry.count("\n") + 1 for entry in output) != len(physical):
+            return False
+        self.output = output
+        return True
+
+    def retranslate(self):
+        lines = self.lines
+        self.lines, self.translated, self.indents, self.output, self.extra = [], [], [], [], {}
+        self.splice(0, 0, lines, 0)
+
+    def recover(self, stop):
+        """Make translated and indents known for lines [0, stop).
+
+        They are read back off the output apply_indent() produced; when that does
+        not match the source, the document is translated again instead.
+        """
+        indent = self.indent_after(len(self.translated))
+        for i in range(len(self.translated), min(stop, len(self.lines))):
+            source, line = self.lines[i], self.output[i]
+            self.indents.append(indent)
+            if not source.strip():
+                if line:
+                    return self.retranslate()
+                self.translated.append(None)
+                continue
+            if not self.brace:
+                self.translated.append(line)
+                continue
+            prefix = indent - 1 if line.strip().startswith("}") and not line.rstrip().endswith("{") else indent
+            prefix = "    " * prefix
+            if not line and prefix:
+                self.translated.append(None)  # the line rules returned None
+                continue
+            if not line.startswith(prefix):
+                return self.retranslate()
+            t_line = line[len(prefix):]
+            self.translated.append(t_line)
+            indent = indent_line(t_line, indent)[1]
+
+    @property
+    def text(self):
+        return "\n".join(self.output)
+
+    def indent_after(self, index):
+        """Brace indent counter after line index - 1 (before line index); lines before it must be known."""
+        if index < len(self.indents):
+            return self.indents[index]
+        if not self.indents:
+            return 0
+        return indent_line(self.translated[-1], self.indents[-1])[1]
+
+    def output_line(self, index):
+        """Index in self.text.split("\n") of the first output line of source line index."""
+        return index + sum(n for i, n in self.extra.items() if i < index)
+
+    def splice(self, start, end, new_lines, indent, translated=None):
+        """Replace lines [start, end) with new_lines translated from indent; returns the new indent after them."""
+        if translated is None:
+            translated = list(translate_lines(new_lines, self.source_lang, self.target_lang, translator=self.translator))
+        indents, output = [], []
+        for t_line in translated:
+            indents.append(indent)
+            if self.brace:
+                line, indent = indent_line(t_line, indent)
+            else:
+                line = "" if t_line is None else t_line
+            output.append(line)
+        shift = len(new_lines) - (end - start)
+        extra = {i if i < start else i + shift: n for i, n in self.extra.items() if not start <= i < end}
+        for i, line in enumerate(output, start):
+            if "\n" in line:
+                extra[i] = line.count("\n")
+        self.lines[start:end] = new_lines
+        self.translated[start:end] = translated
+        self.indents[start:end] = indents
+        self.output[start:end] = output
+        self.extra = extra
+        return indent
+
+    def edit(self, start, end, lines):
+        """Replace source lines [start, end) with lines.
+
+        lines is a list of source lines, [] to delete; a str is split on "\n", so
+        "" is one blank line. Returns (start, stop, lines): output lines [start, stop) of the previous
+        translation were replaced by lines, for callers that patch their own copy.
+        """
+        new_lines = lines.split("\n") if isinstance(lines, str) else list(lines)
+        if self.whole_module:
+            old_len = len(self.output)
+            self.lines[start:end] = new_lines
+            code = "\n".join(self.lines)
+            self.output = translate_code(code, self.source_lang, self.target_lang, translator=self.translator).split("\n")
+            return 0, old_len, self.output
+
+        self.recover(end)
+        old_after = self.indent_after(end)
+        translated = list(translate_lines(new_lines, self.source_lang, self.target_lang, translator=self.translator))
+        indent = self.indent_after(start)
+        if self.brace:
+            for t_line in translated:
+                indent = indent_line(t_line, indent)[1]
+        shift = indent - old_after
+        moved = shift and self.brace
+        if moved:
+            self.recover(len(self.lines))  # the lines after the edit move: their translations are needed
+            end_line = self.output_line(len(self.lines))
+        else:
+            end_line = self.output_line(end)
+        start_line = self.output_line(start)
+        self.splice(start, end, new_lines, self.indent_after(start), translated)
+        stop = start + len(new_lines)
+        if moved:
+            # the edit changed the brace balance: everything after it moves by the same amount
+            translated, indents, output = self.translated, self.indents, self.output
+            for i in range(stop, len(output)):
+                indents[i] += shift
+                output[i] = indent_line(translated[i], indents[i])[0]
+            stop = len(output)
+        return start_line, end_line, "\n".join(self.output[start:stop]).split("\n") if stop > start else []
+
+
+def translate_incremental(code, translation, start, end, lines, source_lang, target_lang, cache=line_cache):
+    """Apply one edit to code and return its new translation, reusing translation for the rest.
+
+    translation is translate_code(code, ...); the result equals translate_code() of
+    the edited document; lines is as for IncrementalTranslation.edit(). See
+    line_diff() to derive (start, end, lines) from two versions.
+    """
+    document = IncrementalTranslation.from_translation(code, translation, source_lang, target_lang, cache)
+    document.edit(start, end, lines)
+    return document.text
@@ -0,0 +1,134 @@
+# lexer.py
+import functools
+import re
+
+# ---------------- LINE KINDS ----------------
+LINE_COMMENT = "comment"
+LINE_IMPORT = "import"
+LINE_INCLUDE = "include"
+LINE_CODE = "code"
+
+# ---------------- LITERAL PATTERNS ----------------
+# Unterminated literals and block comments run to the end of the line. String bodies
+# are written as unrolled loops (runs of plain characters between escapes), which
+# scan a run in one step instead of trying an alternation per character. A prefix
+# only counts at the start of a word: the "r" of "or'x'" ends a keyword.
+_DQ = r'"[^"\\]*(?:\\.[^"\\]*)*"?'
+_SQ = r"'[^'\\]*(?:\\.[^'\\]*)*'?"
+PYTHON_STRING = r'(?P<STRING>(?:(?<!\w)[rRbBuUfF]{1,2})?(?:"""[\s\S]*?(?:"""|$)|\'\'\'[\s\S]*?(?:\'\'\'|$)|' + _DQ + "|" + _SQ + "))"
+C_STRING = r'(?P<STRING>(?:(?<!\w)(?:[LuU]|u8))?(?:' + _DQ + "|" + _SQ + "))"
+# Verbatim strings (@"...", $@"...", @$"...") escape a quote by doubling it; regular and
+# interpolated ones ("...", $"...") use backslashes, and are matched by _DQ after the "$".
+CSHARP_STRING = r'(?P<STRING>(?:@\$?|\$@)"[^"]*(?:""[^"]*)*"|' + _DQ + "|" + _SQ + ")"
+JS_STRING = r'(?P<STRING>`[^`\\]*(?:\\.[^`\\]*)*`?|' + _DQ + "|" + _SQ + ")"
+HASH_COMMENT = r'(?P<COMMENT>#.*)'
+SLASH_COMMENT = r'(?P<COMMENT>//.*|/\*[\s\S]*?(?:\*/|$))'
+
+
+def _compile_literals(string, comment, first):
+    # the lookahead rejects most positions before the alternation is tried
+    return re.compile(f"(?=[{re.escape(first)}])(?:{comment}|{string})")
+
+
+LANG_PATTERNS = {
+    "python": (PYTHON_STRING, HASH_COMMENT),
+    "java": (C_STRING, SLASH_COMMENT),
+    "c": (C_STRING, SLASH_COMMENT),
+    "c++": (C_STRING, SLASH_COMMENT),
+    "c#": (CSHARP_STRING, SLASH_COMMENT),
+    "javascript": (JS_STRING, SLASH_COMMENT),
+}
+# Every character a literal or comment of LANG_PATTERNS can start with, prefixes included.
+LITERAL_FIRST_CHARS = {
+    "python": "#\"'rRbBuUfF",
+    "java": "/\"'LuU",
+    "c": "/\"'LuU",
+    "c++": "/\"'LuU",
+    "c#": "/\"'$@",
+    "javascript": "/\"'`",
+}
+
+
+# Patterns are compiled on first use of a language, so a worker that serves a few
+# pairs never builds the rest; flaskapp.warm_up() compiles them ahead of a fork.
+@functools.lru_cache(maxsize=32)  # bounded: lang may be any string a client sent
+def literal_re(lang):
+    """The string and comment alternatives of lang: one scan finds every literal."""
+    if lang not in LANG_PATTERNS:
+        lang = "c"
+    return _compile_literals(*LANG_PATTERNS[lang], LITERAL_FIRST_CHARS[lang])
+
+
+# ---------------- LEXER ----------------
+# Literals and comments are blanked with NUL rather than spaces: neither a word nor
+# whitespace character, so patterns run on the blanked view (the condition
+# operators' \b and \s*) see a literal as one opaque run, as they would its quote.
+BLANK = "\0"
+
+
+def _blank(match):
+    return BLANK * len(match.group())
+
+
+def classify_line(text, lang):
+    """Return the kind of a stripped, non-empty line: comment, import, include or code."""
+    if text.startswith("#include") and lang != "python":
+        return LINE_INCLUDE
+    if text.startswith(("#", "//", "/*", "*/")):
+        return LINE_COMMENT
+    if text.startswith(("import ", "from ")):
+        return LINE_IMPORT
+    return LINE_CODE
+
+
+HEAD_RE = re.compile(r'\w+|\S')
+# Substrings that can open a string literal or comment; lines without any skip the
+# literal scan. A lone "/" (division) or "@" (annotation) cannot.
+LITERAL_STARTS = {
+    "python": ('"', "'", "#"),
+    "javascript": ('"', "'", "`", "//", "/*"),
+}
+C_LITERAL_STARTS = ('"', "'", "//", "/*")
+
+
+def has_literal(text, lang):
+    """False when text cannot contain a string literal or comment of lang."""
+    for start in LITERAL_STARTS.get(lang, C_LITERAL_STARTS):
+        if start in text:
+            return True
+    return False
+
+
+def blank_literals(text, lang):
+    """text with the string literals and comments of lang blanked out (same length)."""
+    if has_literal(text, lang):
+        return literal_re(lang).sub(_blank, text)
+    return text
+
+
+class LexedLine:
+    """One stripped line as seen by the translator, classified and lexed once.
+
+    kind: LINE_COMMENT, LINE_IMPORT, LINE_INCLUDE or LINE_CODE.
+    code: the line with string literals and comments blanked out (same length),
+          for substring checks, parenthesis matching and condition rewriting,
+          none of which may look inside literals. Slices of it line up with
+          slices of text.
+    head: the first word (or character), used for rule dispatch.
+    """
+
+    __slots__ = ("text", "kind", "code", "head")
+
+    def __init__(self, text, lang):
+        self.text = self.code = text
+        self.kind = kind = classify_line(text, lang)
+        if kind == LINE_CODE:
+            self.code = blank_literals(text, lang)
+        head = HEAD_RE.match(text)
+        self.head = head.group() if head else ""
+
+
+@functools.lru_cache(maxsize=8192)
+def lex_line(text, lang):
+    """Classify and lex one stripped line; repeated lines are served from the cache."""
+    return LexedLine(text, lang)
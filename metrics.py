@@ -0,0 +1,129 @@
+# metrics.py
+import bisect
+import threading
+from collections import defaultdict
+
+# ---------------- BUCKETS ----------------
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (64, 256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+
+class Shard:
+    """One thread's counters and histograms; only that thread ever writes to it."""
+
+    def __init__(self):
+        self.counters = defaultdict(float)
+        self.histograms = {}
+
+    def merge(self, other):
+        for key, value in list(other.counters.items()):
+            self.counters[key] += value
+        for key, (buckets, counts, total) in list(other.histograms.items()):
+            mine = self.histograms.get(key)
+            if mine is None:
+                self.histograms[key] = [buckets, list(counts), total]
+            else:
+                mine[1] = [a + b for a, b in zip(mine[1], counts)]
+                mine[2] += total
+
+
+class Registry:
+    """Prometheus-style counters and histograms kept in per-thread shards.
+
+    Recording touches only the calling thread's shard, so the request path takes
+    no lock; the lock is held only to register a new thread and while scraping.
+    """
+
+    def __init__(self):
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.shards = []          # (thread, Shard) for live threads
+        self.retired = Shard()    # totals folded in from threads that have exited
+        self.help = {}
+        self.gauges = {}          # name -> callable returning {labels: value}
+
+    def shard(self):
+        shard = getattr(self.local, "shard", None)
+        if shard is None:
+            shard = self.local.shard = Shard()
+            with self.lock:
+                self.shards.append((threading.current_thread(), shard))
+        return shard
+
+    def describe(self, name, kind, text):
+        self.help[name] = (kind, text)
+
+    def gauge(self, name, text, collect, kind="gauge"):
+        """Register a metric whose samples are read from collect() at scrape time."""
+        self.describe(name, kind, text)
+        self.gauges[name] = collect
+
+    def inc(self, name, labels=(), value=1):
+        self.shard().counters[(name, labels)] += value
+
+    def observe(self, name, labels, value, buckets=LATENCY_BUCKETS):
+        histograms = self.shard().histograms
+        entry = histograms.get((name, labels))
+        if entry is None:
+            entry = histograms[(name, labels)] = [buckets, [0] * (len(buckets) + 1), 0.0]
+        entry[1][bisect.bisect_left(buckets, value)] += 1
+        entry[2] += value
+
+    def collect(self):
+        """Merge all shards into one Shard, folding in threads that have exited."""
+        total = Shard()
+        with self.lock:
+            live = []
+            for thread, shard in self.shards:
+                if thread.is_alive():
+                    live.append((thread, shard))
+                else:
+                    self.retired.merge(shard)
+            self.shards = live
+            total.merge(self.retired)
+            for _, shard in live:
+                total.merge(shard)
+        return total
+
+    def render(self):
+        """Return every metric in the Prometheus text exposition format."""
+        total = self.collect()
+        samples = defaultdict(list)
+        for (name, labels), value in total.counters.items():
+            samples[name].append(f"{name}{format_labels(labels)} {format_value(value)}")
+        for (name, labels), (buckets, counts, value_sum) in total.histograms.items():
+            cumulative = 0
+            for bound, count in zip(buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else format_value(bound)
+                samples[name].append(f"{name}_bucket{format_labels(labels + (('le', le),))} {cumulative}")
+            samples[name].append(f"{name}_sum{format_labels(labels)} {format_value(value_sum)}")
+            samples[name].append(f"{name}_count{format_labels(labels)} {cumulative}")
+        for name, collect in self.gauges.items():
+            for labels, value in collect().items():
+                samples[name].append(f"{name}{format_labels(labels)} {format_value(value)}")
+
+        out = []
+        for name in sorted(samples):
+            if name in self.help:
+                kind, text = self.help[name]
+                out.append(f"# HELP {name} {text}")
+                out.append(f"# TYPE {name} {kind}")
+            out.extend(samples[name])
+        return "\n".join(out) + "\n"
+
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{escape_label(value)}"' for key, value in labels) + "}"
+
+
+def format_value(value):
+    if value == int(value):
+        return str(int(value))
+    return repr(float(value))
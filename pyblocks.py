@@ -0,0 +1,171 @@
+# pyblocks.py
+# Block tree of a Python module for the AST path (PYTHON_FRONTEND=ast): built by
+# frontends.PythonFrontend and written by emitters.BraceEmitter. Only the block
+# structure is lowered; this is not a language-neutral IR. Simple statements,
+# conditions and expressions stay Python source text, which the emitter passes
+# through the CodeTranslator line rules.
+# Nodes use __slots__ so a module of a million statements costs tens of bytes per
+# node instead of a per-instance __dict__; block bodies are plain lists.
+
+
+class Node:
+    __slots__ = ()
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+
+class Module(Node):
+    __slots__ = ("body",)
+
+    def __init__(self, body):
+        self.body = body
+
+
+# ---------------- LEAF STATEMENTS ----------------
+class Blank(Node):
+    """An empty line kept from the source between two statements."""
+
+    __slots__ = ()
+
+
+BLANK = Blank()  # stateless, so every blank line shares one instance
+
+
+class Comment(Node):
+    __slots__ = ("text",)
+
+    def __init__(self, text):
+        self.text = text
+
+
+class Import(Node):
+    __slots__ = ("text",)
+
+    def __init__(self, text):
+        self.text = text
+
+
+class Statement(Node):
+    """A simple statement on one logical line, as Python source; translated by the line rules."""
+
+    __slots__ = ("text",)
+
+    def __init__(self, text):
+        self.text = text
+
+
+class Return(Node):
+    __slots__ = ("value",)
+
+    def __init__(self, value=None):
+        self.value = value
+
+
+class Jump(Node):
+    """pass, break or continue."""
+
+    __slots__ = ("keyword",)
+
+    def __init__(self, keyword):
+        self.keyword = keyword
+
+
+class Raw(Node):
+    """Source lines of a construct the frontend does not lower; emitted as comments."""
+
+    __slots__ = ("lines",)
+
+    def __init__(self, lines):
+        self.lines = lines
+
+
+# ---------------- BLOCKS ----------------
+class FunctionDef(Node):
+    __slots__ = ("name", "params", "body", "decorators")
+
+    def __init__(self, name, params, body, decorators=()):
+        self.name = name
+        self.params = params
+        self.body = body
+        self.decorators = tuple(decorators)
+
+
+class ClassDef(Node):
+    __slots__ = ("name", "bases", "body", "decorators")
+
+    def __init__(self, name, bases, body, decorators=()):
+        self.name = name
+        self.bases = bases
+        self.body = body
+        self.decorators = tuple(decorators)
+
+
+class If(Node):
+    """orelse is a list of statements; a lone If in it is an else-if."""
+
+    __slots__ = ("test", "body", "orelse")
+
+    def __init__(self, test, body, orelse=()):
+        self.test = test
+        self.body = body
+        self.orelse = list(orelse)
+
+
+class While(Node):
+    __slots__ = ("test", "body")
+
+    def __init__(self, test, body):
+        self.test = test
+        self.body = body
+
+
+class For(Node):
+    __slots__ = ("target", "iter", "body")
+
+    def __init__(self, target, iter, body):
+        self.target = target
+        self.iter = iter
+        self.body = body
+
+
+class ForRange(Node):
+    """for target in range(start, stop, step), with all bounds as text."""
+
+    __slots__ = ("target", "start", "stop", "step", "body")
+
+    def __init__(self, target, start, stop, step, body):
+        self.target = target
+        self.start = start
+        self.stop = stop
+        self.step = step
+        self.body = body
+
+
+class With(Node):
+    """with items: body, with the items as source text."""
+
+    __slots__ = ("items", "body")
+
+    def __init__(self, items, body):
+        self.items = items
+        self.body = body
+
+
+class Handler(Node):
+    __slots__ = ("type", "name", "body")
+
+    def __init__(self, type, name, body):
+        self.type = type
+        self.name = name
+        self.body = body
+
+
+class Try(Node):
+    __slots__ = ("body", "handlers", "finalbody")
+
+    def __init__(self, body, handlers, finalbody=()):
+        self.body = body
+        self.handlers = handlers
+        self.finalbody = list(finalbody)
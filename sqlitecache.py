@@ -0,0 +1,196 @@
+# sqlitecache.py
+# Translations persisted in one SQLite file shared by every worker process and kept
+# across restarts. WAL mode lets any number of processes read while one writes;
+# writes (and recency updates from reads) are buffered and committed in batches.
+import atexit
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key BLOB PRIMARY KEY,
+    version TEXT NOT NULL,
+    value TEXT,
+    size INTEGER NOT NULL,
+    used REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS entries_used ON entries (used);
+CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+INSERT OR IGNORE INTO meta VALUES ('bytes', 0);
+"""
+
+
+class SQLiteCache:
+    """Persistent key -> text store with size-based least-recently-used eviction.
+
+    Keys are hashed together with a namespace and the translator rules version,
+    so entries written by other rules are never returned; rows of other versions
+    are dropped when the file is first used. get_version is called then, not
+    here, so the store can be created before the rules it versions. Safe to use
+    from many threads and processes at once; each thread of each process gets
+    its own connection.
+    """
+
+    def __init__(self, path, get_version, max_bytes=512 * 1024 * 1024, batch=256):
+        self.path = path
+        self.get_version = get_version
+        self.version = None
+        self.max_bytes = max_bytes
+        self.batch = batch
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.pending = {}  # digest -> value to insert
+        self.touched = set()  # digests read since the last flush
+        self.hits = 0
+        self.misses = 0
+        atexit.register(self.flush)
+
+    def open(self):
+        with self.lock:
+            if self.version is not None:
+                return
+            version = self.get_version()
+            db = self.connect()
+            db.executescript(SCHEMA)
+            with db:
+                db.execute("DELETE FROM entries WHERE version != ?", (version,))
+                db.execute("UPDATE meta SET value = (SELECT COALESCE(SUM(size), 0) FROM entries) WHERE name = 'bytes'")
+            self.version = version
+
+    def connect(self):
+        """The calling thread's connection, reopened after a fork."""
+        db = getattr(self.local, "db", None)
+        if db is None or self.local.pid != os.getpid():
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db = Transactions(db)
+            self.local.db, self.local.pid = db, os.getpid()
+        return db
+
+    def digest(self, namespace, key):
+        if self.version is None:
+            self.open()
+        h = hashlib.blake2b(digest_size=16)
+        h.update(f"{self.version}\0{namespace}\0{key!r}".encode("utf-8", "surrogatepass"))
+        return h.digest()
+
+    def get(self, namespace, key, default=None):
+        digest = self.digest(namespace, key)
+        with self.lock:
+            value = self.pending.get(digest)
+        if value is None:
+            row = self.connect().execute("SELECT value FROM entries WHERE key = ?", (digest,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return default
+            value = row[0]
+            with self.lock:
+                self.touched.add(digest)
+        self.hits += 1
+        return value
+
+    def put(self, namespace, key, value):
+        digest = self.digest(namespace, key)
+        with self.lock:
+            self.pending[digest] = value
+            full = len(self.pending) + len(self.touched) >= self.batch
+        if full:
+            self.flush()
+
+    def flush(self):
+        """Commit buffered writes and recency updates, then evict down to max_bytes."""
+        with self.lock:
+            pending, self.pending = self.pending, {}
+            touched, self.touched = self.touched, set()
+        if not pending and not touched:
+            return
+        now = time.time()
+        added = 0
+        with self.connect() as db:
+            for digest, value in pending.items():
+                size = len(value.encode("utf-8", "surrogatepass")) if value else 0
+                cursor = db.execute("INSERT OR IGNORE INTO entries VALUES (?, ?, ?, ?, ?)",
+                                    (digest, self.version, value, size, now))
+                added += size if cursor.rowcount else 0
+            db.executemany("UPDATE entries SET used = ? WHERE key = ?", [(now, digest) for digest in touched])
+            total = db.execute("UPDATE meta SET value = value + ? WHERE name = 'bytes' RETURNING value",
+                               (added,)).fetchone()[0]
+            if total > self.max_bytes:
+                self.evict(db, total - self.max_bytes * 9 // 10)
+
+    def evict(self, db, excess):
+        """Delete least recently used rows until at least excess bytes are freed."""
+        freed = 0
+        while freed < excess:
+            rows = db.execute("SELECT key, size FROM entries ORDER BY used LIMIT 512").fetchall()
+            if not rows:
+                break
+            db.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key, _ in rows])
+            freed += sum(size for _, size in rows)
+        db.execute("UPDATE meta SET value = MAX(value - ?, 0) WHERE name = 'bytes'", (freed,))
+
+    def size(self):
+        self.open()
+        return self.connect().execute("SELECT value FROM meta WHERE name = 'bytes'").fetchone()[0]
+
+
+class Transactions:
+    """A connection in autocommit mode whose `with` block is one write transaction."""
+
+    def __init__(self, db):
+        self.db = db
+
+    def execute(self, *args):
+        return self.db.execute(*args)
+
+    def executemany(self, *args):
+        return self.db.executemany(*args)
+
+    def executescript(self, script):
+        return self.db.executescript(script)
+
+    def __enter__(self):
+        self.db.execute("BEGIN IMMEDIATE")
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.db.execute("ROLLBACK" if exc_type else "COMMIT")
+
+
+class TieredCache:
+    """An in-memory LRUCache in front of one namespace of a SQLiteCache, with the same get/put API."""
+
+    def __init__(self, memory, store, namespace):
+        self.memory = memory
+        self.store = store
+        self.namespace = namespace
+
+    def get(self, key, default=None):
+        value = self.memory.get(key)
+        if value is None:
+            value = self.store.get(self.namespace, key)
+            if value is None:
+                return default
+            self.memory.put(key, value)
+        return value
+
+    def put(self, key, value):
+        self.memory.put(key, value)
+        self.store.put(self.namespace, key, value)
+
+    # counters and entries of the memory tier, for the metrics endpoint
+    @property
+    def hits(self):
+        return self.memory.hits
+
+    @property
+    def misses(self):
+        return self.memory.misses
+
+    @property
+    def data(self):
+        return self.memory.data
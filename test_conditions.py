@@ -0,0 +1,147 @@
+# test_conditions.py
+# Property tests for CodeTranslator.translate_condition(): conditions are built
+# from random pieces whose translation is known, so the expected output is built
+# alongside the input. Seeded, so a failure reproduces.
+import random
+
+import pytest
+
+from flaskapp import NULL_LITERALS, CodeTranslator, translate_code
+
+SEED = 20240614
+CASES = 500
+
+# Identifiers that contain an operator word or literal without being one.
+TRICKY_NAMES = ["android", "notice", "nothing", "order", "origin", "island", "isNone", "Nones", "Trueish",
+                "falsey", "nullable", "trueCount", "undefinedness", "NULLS", "nullptrs", "x", "done", "n2"]
+C_SOURCES = ["java", "c", "c++", "c#", "javascript"]
+C_TARGETS = ["java", "c", "c++", "c#", "javascript"]
+
+
+def python_condition(rng, target):
+    """A random Python condition and its translation to target."""
+    null = NULL_LITERALS[target][0]
+    is_, is_not = ("===", "!==") if target == "javascript" else ("==", "!=")
+    atoms = [(name, name) for name in TRICKY_NAMES] + [
+        ("True", "true"),
+        ("False", "false"),
+        ("'a and not b'", "'a and not b'"),
+        ('"x is None or True"', '"x is None or True"'),
+        ("'!'", "'!'"),
+    ]
+
+    def operand():
+        source, translated = rng.choice(atoms)
+        kind = rng.randrange(4)
+        if kind == 0:
+            return f"not {source}", f"!{translated}"
+        if kind == 1:
+            return f"{source} is None", f"{translated} {is_} {null}"
+        if kind == 2:
+            return f"{source} is not None", f"{translated} {is_not} {null}"
+        return source, translated
+
+    source, translated = operand()
+    for _ in range(rng.randrange(4)):
+        op, target_op = rng.choice([("and", "&&"), ("or", "||"), ("!=", "!="), ("==", "=="), ("<", "<")])
+        right, right_translated = operand()
+        source += f" {op} {right}"
+        translated += f" {target_op} {right_translated}"
+    return source, translated
+
+
+def c_condition(rng, source_lang, target):
+    """A random condition in a C-family source_lang and its translation to target."""
+    null = NULL_LITERALS[source_lang][0]
+    target_null = NULL_LITERALS[target][0]
+    python = target == "python"
+    atoms = [(name, name) for name in TRICKY_NAMES] + [
+        ("true", "True" if python else "true"),
+        ("false", "False" if python else "false"),
+        (null, target_null),
+        ('"a && !b || true"', '"a && !b || true"'),
+        ("'!'", "'!'"),
+        ("42", "42"),
+    ]
+
+    def operand():
+        source, translated = rng.choice(atoms)
+        if rng.randrange(3) == 0:
+            return f"!{source}", (f"not {translated}" if python else f"!{translated}")
+        return source, translated
+
+    ops = [("!=", "!="), ("==", "=="), ("<", "<")]
+    ops += [("&&", "and"), ("||", "or")] if python else [("&&", "&&"), ("||", "||")]
+    source, translated = operand()
+    for _ in range(rng.randrange(4)):
+        op, target_op = rng.choice(ops)
+        right, right_translated = operand()
+        source += f" {op} {right}"
+        translated += f" {target_op} {right_translated}"
+    return source, translated
+
+
+@pytest.mark.parametrize("target", C_TARGETS)
+def test_python_conditions(target):
+    rng = random.Random(f"{SEED}:python:{target}")
+    translator = CodeTranslator("python", target)
+    for _ in range(CASES):
+        source, expected = python_condition(rng, target)
+        assert translator.translate_condition(source) == expected, source
+
+
+@pytest.mark.parametrize("source_lang", C_SOURCES)
+@pytest.mark.parametrize("target", ["python"] + C_TARGETS)
+def test_c_family_conditions(source_lang, target):
+    if source_lang == target:
+        pytest.skip("same language")
+    rng = random.Random(f"{SEED}:{source_lang}:{target}")
+    translator = CodeTranslator(source_lang, target)
+    for _ in range(CASES):
+        source, expected = c_condition(rng, source_lang, target)
+        assert translator.translate_condition(source) == expected, source
+
+
+def test_not_equal_is_not_negation():
+    translator = CodeTranslator("java", "python")
+    rng = random.Random(SEED)
+    for _ in range(CASES):
+        names = rng.sample(TRICKY_NAMES, 3)
+        condition = f"{names[0]} != {names[1]} && !{names[2]}"
+        assert translator.translate_condition(condition) == f"{names[0]} != {names[1]} and not {names[2]}"
+    assert translator.translate_condition("a!=b") == "a!=b"
+    assert translator.translate_condition("!a") == "not a"
+
+
+def test_literals_are_kept():
+    rng = random.Random(SEED)
+    words = ["and", "or", "not", "is", "None", "True", "&&", "||", "!", "!=", "null", "'", "\\\""]
+    for source_lang, target, quotes in [("python", "java", "'\""), ("java", "python", "\""), ("c", "python", "\""),
+                                        ("c#", "python", "\""), ("javascript", "python", "\"'`")]:
+        translator = CodeTranslator(source_lang, target)
+        for _ in range(CASES):
+            quote = rng.choice(quotes)
+            body = " ".join(rng.choice(words) for _ in range(rng.randint(1, 6))).replace(quote, "")
+            literal = quote + body + quote
+            condition = f"x == {literal}"
+            assert translator.translate_condition(condition) == condition, condition
+    # char literals and comments in C-family sources
+    translator = CodeTranslator("c", "python")
+    assert translator.translate_condition("c == '!' && d") == "c == '!' and d"
+    assert translator.translate_condition("a && b /* && c */") == "a and b /* && c */"
+    # C# escapes quotes with a backslash except in verbatim strings, which double them
+    translator = CodeTranslator("c#", "python")
+    assert translator.translate_condition('s == "a\\"b" && c') == 's == "a\\"b" and c'
+    assert translator.translate_condition('s == $"a\\"b" && c') == 's == $"a\\"b" and c'
+    assert translator.translate_condition('s == @"a""b" && c') == 's == @"a""b" and c'
+    assert translator.translate_condition('s == @"a\\" && c') == 's == @"a\\" and c'
+    # a string prefix only starts a word: the "r" of "or" does not open a raw string
+    assert CodeTranslator("python", "java").translate_condition("a or'x'") == "a ||'x'"
+
+
+def test_conditions_of_lexed_lines():
+    # conditions cut out of a line are rewritten over that line's lexed view
+    assert translate_code('if s == "a: b" and not t:', "python", "java") == 'if (s == "a: b" && !t) {'
+    assert translate_code('while x is not None or "y or z":', "python", "c") == 'while (x != NULL || "y or z") {'
+    assert translate_code('if (s == "a && b" && !t) {', "java", "python") == 'if s == "a && b" and not t:'
+    assert translate_code('} else if (c == \'!\' || d) {', "java", "python") == "elif c == '!' or d:"
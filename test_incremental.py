@@ -0,0 +1,52 @@
+# test_incremental.py
+# Edits applied through IncrementalTranslation must give what translate_code()
+# gives for the edited document. Seeded, so a failure reproduces.
+import random
+
+import pytest
+
+from flaskapp import translate_code
+from incremental import IncrementalTranslation, line_diff, translate_incremental
+
+SEED = 20240615
+CASES = 100
+
+PYTHON_LINES = ["x = 1", "y = 2", "if x:", "    print(x)", "else:", "    y = x", "for i in range(3):",
+                "    x += i", "", "print(y)"]
+
+
+@pytest.mark.parametrize("old, new, expected", [
+    ("x = 1\ny = 2", "x = 1\n\ny = 2", (1, 1, [""])),
+    ("x = 1\ny = 2", "x = 1\nz = 3\n\ny = 2", (1, 1, ["z = 3", ""])),
+    ("x = 1\n\ny = 2", "x = 1\ny = 2", (1, 2, [])),
+])
+def test_line_diff_keeps_blank_lines(old, new, expected):
+    assert line_diff(old, new) == expected
+
+
+@pytest.mark.parametrize("target", ["java", "javascript", "python"])
+def test_blank_line_inserts(target):
+    rng = random.Random(SEED)
+    for _ in range(CASES):
+        old = "\n".join(rng.choice(PYTHON_LINES) for _ in range(rng.randint(1, 8)))
+        lines = old.splitlines()
+        at = rng.randint(0, len(lines))
+        insert = [rng.choice(PYTHON_LINES) for _ in range(rng.randint(0, 2))] + [""] * rng.randint(1, 2)
+        edited = lines[:at] + insert + lines[at:]
+        new = "\n".join(edited)
+        expected = translate_code(new, "python", target)
+        translation = translate_code(old, "python", target)
+        assert translate_incremental(old, translation, *line_diff(old, new), "python", target) == expected, new
+        if new.splitlines() != edited:
+            continue  # blank lines appended at the end read back as a line terminator
+        document = IncrementalTranslation(old, "python", target)
+        document.edit(at, at, insert)
+        assert document.text == expected, new
+
+
+def test_edit_text_is_split_on_newlines():
+    document = IncrementalTranslation("x = 1\ny = 2", "python", "java")
+    document.edit(1, 1, "")
+    assert document.text == translate_code("x = 1\n\ny = 2", "python", "java")
+    document.edit(1, 2, [])
+    assert document.text == translate_code("x = 1\ny = 2", "python", "java")